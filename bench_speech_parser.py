@@ -0,0 +1,282 @@
+"""
+发言解析性能对比脚本
+功能：
+1. 在样本语料上校验新解析器（使用 obs_config.json 中的命令规则和场景关键词）与旧实现的结果一致
+   （INTENDED_CHANGES 中列出的有意变化除外）
+2. 校验增量读取器的编码检测：GBK 文件第一次只写入 ASCII 内容时，之后的中文行仍按 GBK 解码
+3. 分别测量新旧实现以及批量接口每秒可处理的行数
+
+用法：
+    python bench_speech_parser.py                    # 使用内置样本语料
+    python bench_speech_parser.py 用户发言记录.txt     # 额外加入真实日志文件中的行
+"""
+
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from log_tailer import LogTailer
+from command_rules import load_command_rules
+from speech_parser import parse_speech, parse_batch
+
+# 内置样本语料：覆盖三种日志格式、108规则、特殊场景和各种无效输入
+GOLDEN_CORPUS = [
+    "2025-08-29 22:53:09[用户发言]t： 有黄水吗",
+    "2025-08-29 22:53:10[用户发言]小明： 看3",
+    "2025-08-29 22:53:11[用户发言]小红： 看看12号",
+    "2025-08-29 22:53:12[用户发言]阿强： 看108",
+    "2025-08-29 22:53:13[用户发言]阿强： 看108颗的8米",
+    "2025-08-29 22:53:14[用户发言]阿强： 看0.8米108",
+    "2025-08-29 22:53:15[用户发言]阿强： 看0.6米108",
+    "2025-08-29 22:53:16[用户发言]阿强： 108看2.5",
+    "2025-08-29 22:53:17[用户发言]阿强： 看1080",
+    "2025-08-29 22:53:18[用户发言]阿强： 看 1.5 和 2",
+    "2025-08-29 22:53:19[用户发言]主播： ",
+    "2025-08-29 22:53:20[用户发言]无冒号的发言",
+    "2025-08-29 22:53:21[用户发言]用户：看：7",
+    "2025-08-29 22:53:22[用户发言]用户： 看１２",
+    "2025-08-29 22:53:23 [用户发言]用户： 看5",
+    "[用户发言]路人甲： 看6",
+    "[用户发言]路人乙： 价格多少",
+    "[用户发言]路人丙：",
+    "22:53:09 观众： 看10",
+    "22:53:09   观众： 看一下9号",
+    "22:53:09观众： 看10",
+    "观众： 看4",
+    "看5",
+    "   ",
+    "",
+    "2025-08-29 22:53:24[系统消息]直播间人数： 108",
+    "2025-08-29 22:53:25[用户发言]用户： 看108 108",
+    "2025-08-29 22:53:26[用户发言]用户： 看3.14.15",
+    "2025-08-29 22:53:27[用户发言]用户： 看108.5",
+    # 场景名称关键词：与数字规则的结果一致，默认场景名称不是关键词
+    "2025-08-29 22:53:28[用户发言]用户： 看8米项链108颗",
+    "2025-08-29 22:53:29[用户发言]用户： 看8米项链",
+    "2025-08-29 22:53:30[用户发言]用户： 看6米项链",
+    "2025-08-29 22:53:31[用户发言]用户： 看12不要多圈",
+    "2025-08-29 22:53:32[用户发言]用户： 看4多圈",
+    "2025-08-29 22:53:33[用户发言]用户： 看看默认的价格",
+    # 场景关键词只匹配到更大数字的一部分时，按数字规则处理
+    "2025-08-29 22:53:34[用户发言]用户： 看14多圈",
+    "2025-08-29 22:53:35[用户发言]用户： 看24多圈",
+    "2025-08-29 22:53:36[用户发言]用户： 看一下14多圈的",
+    "2025-08-29 22:53:37[用户发言]用户： 看18米项链108颗",
+]
+
+# 有意的行为变化：修饰数字改为按完整数字匹配，"1080"、"108.5" 不再被当作 "108"
+INTENDED_CHANGES = {
+    "2025-08-29 22:53:17[用户发言]阿强： 看1080": ("看1080", "1080"),
+    "2025-08-29 22:53:27[用户发言]用户： 看108.5": ("看108.5", "108.5"),
+}
+
+
+def legacy_extract_user_speech(line):
+    """旧实现：依次尝试三个正则（每次调用都重新编译）"""
+    if not line or not line.strip():
+        return "空内容"
+
+    original_line = line.strip()
+
+    import re
+    pattern1 = r'\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\[用户发言\][^：]*：\s*(.*)'
+    match1 = re.match(pattern1, original_line)
+    if match1:
+        content = match1.group(1).strip()
+        return content if content else "空内容"
+
+    pattern2 = r'\[用户发言\][^：]*：\s*(.*)'
+    match2 = re.match(pattern2, original_line)
+    if match2:
+        content = match2.group(1).strip()
+        return content if content else "空内容"
+
+    pattern3 = r'\d{2}:\d{2}:\d{2}\s+[^：]*：\s*(.*)'
+    match3 = re.match(pattern3, original_line)
+    if match3:
+        content = match3.group(1).strip()
+        return content if content else "空内容"
+
+    return original_line
+
+
+def legacy_extract_number_with_kan(content):
+    """旧实现：108规则和普通规则分别提取数字"""
+    import re
+
+    if not content or not content.strip():
+        return None
+
+    if "看" not in content:
+        return None
+
+    if "108" in content:
+        numbers = re.findall(r'\d+(?:\.\d+)?', content)
+        other_numbers = [num for num in numbers if num != "108"]
+
+        if other_numbers:
+            try:
+                base_number = float(other_numbers[0])
+                result = base_number + 108
+                if result == 108.8:
+                    return "116"
+                elif result == 108.6:
+                    return "114"
+                if result.is_integer():
+                    return str(int(result))
+                else:
+                    return str(result)
+            except ValueError:
+                return None
+        else:
+            return None
+
+    numbers = re.findall(r'\d+(?:\.\d+)?', content)
+    if numbers:
+        return numbers[0]
+    return None
+
+
+def legacy_parse_speech(line):
+    """旧实现的完整处理流程"""
+    content = legacy_extract_user_speech(line)
+    return content, legacy_extract_number_with_kan(content)
+
+
+def load_corpus(paths):
+    """
+    加载样本语料
+    :param paths: 额外的日志文件路径列表
+    :return: 日志行列表
+    """
+    corpus = list(GOLDEN_CORPUS)
+    for path in paths:
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                corpus.extend(line.rstrip('\n') for line in f)
+        except OSError as e:
+            print(f"⚠️ 无法读取 {path}: {e}")
+    return corpus
+
+
+def verify(corpus, rules=None):
+    """
+    校验新旧实现结果一致（有意的行为变化按 INTENDED_CHANGES 校验）
+    :param corpus: 日志行列表
+    :param rules: CommandRules 实例，为None时使用默认规则
+    :return: 不一致的行数
+    """
+    mismatches = 0
+    for line in corpus:
+        expected = INTENDED_CHANGES.get(line) or legacy_parse_speech(line)
+        actual = parse_speech(line, rules)
+        if actual != expected:
+            mismatches += 1
+            print(f"❌ 结果不一致: {line!r}")
+            print(f"   旧实现: {expected}")
+            print(f"   新实现: {actual}")
+    return mismatches
+
+
+def verify_encoding_detection():
+    """
+    校验编码检测：新建的 GBK 日志第一次写入的是纯 ASCII 行（时间戳、系统消息）时，
+    编码不能被固定为 UTF-8，之后写入的中文发言仍要正确解码，也不能被字节预过滤丢掉
+    :return: 不一致的行数
+    """
+    expected = [
+        "2025-08-29 22:53:09 system start",
+        "2025-08-29 22:53:10[用户发言]乙： 看8",
+    ]
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "用户发言记录.txt")
+        open(path, 'wb').close()
+        tailer = LogTailer(path, start_at_end=False, line_filter=load_command_rules().byte_filter)
+        actual = []
+        for line in expected:
+            with open(path, 'ab') as f:
+                f.write((line + "\n").encode('gbk'))
+            actual.extend(tailer.read_new_lines())
+        tailer.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    mismatches = 0
+    for want, got in zip(expected, actual + [None] * len(expected)):
+        if got != want:
+            mismatches += 1
+            print(f"❌ 编码检测结果不一致（{tailer.encoding}）: {got!r}，应为 {want!r}")
+    return mismatches
+
+
+def measure(parse, corpus, min_duration=1.0):
+    """
+    测量解析速度
+    :param parse: 解析函数
+    :param corpus: 日志行列表
+    :param min_duration: 最短测量时间（秒）
+    :return: 每秒处理的行数
+    """
+    processed = 0
+    start = time.perf_counter()
+    while True:
+        for line in corpus:
+            parse(line)
+        processed += len(corpus)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_duration:
+            return processed / elapsed
+
+
+def measure_batch(corpus, min_duration=1.0):
+    """
+    测量批量接口的解析速度
+    :param corpus: 日志行列表
+    :param min_duration: 最短测量时间（秒）
+    :return: 每秒处理的行数
+    """
+    # 样本较少时重复拼接，使每批的行数接近实际回放时的批量
+    batch = corpus * max(1, 1024 // len(corpus))
+    processed = 0
+    start = time.perf_counter()
+    while True:
+        parse_batch(batch)
+        processed += len(batch)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_duration:
+            return processed / elapsed
+
+
+def main():
+    """性能对比入口"""
+    corpus = load_corpus(sys.argv[1:])
+    print(f"📄 样本语料: {len(corpus):,} 行")
+
+    mismatches = verify(corpus, load_command_rules())
+    if mismatches:
+        print(f"❌ {mismatches} 行结果不一致")
+        sys.exit(1)
+    print(f"✅ 新旧实现结果一致（有意变化 {len(INTENDED_CHANGES)} 行）")
+
+    if verify_encoding_detection():
+        sys.exit(1)
+    print("✅ 编码检测正确（先写入 ASCII 行的 GBK 文件）")
+
+    # 旧实现依赖 re 模块的编译缓存，先预热一次避免把首次编译计入
+    re.purge()
+    legacy_parse_speech(corpus[0])
+
+    legacy_rate = measure(legacy_parse_speech, corpus)
+    new_rate = measure(parse_speech, corpus)
+    batch_rate = measure_batch(corpus)
+    print(f"🐢 旧实现: {legacy_rate:,.0f} 行/秒")
+    print(f"🚀 新实现: {new_rate:,.0f} 行/秒")
+    print(f"📦 批量接口: {batch_rate:,.0f} 行/秒")
+    print(f"📈 提升: {new_rate / legacy_rate:.2f} 倍")
+
+
+if __name__ == "__main__":
+    main()
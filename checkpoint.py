@@ -0,0 +1,80 @@
+"""
+监控断点保存模块
+功能：
+1. 保存文件标识、已处理的字节偏移、场景切换冷却截止时间、待执行的延迟切换和冷却期待切换队列
+2. 先写临时文件、fsync 后再原子替换，进程崩溃时不会留下半个文件
+3. 重启时读取断点，恢复到上次处理的位置
+"""
+
+import json
+import os
+import time
+
+
+class CheckpointStore:
+    """断点文件读写"""
+
+    VERSION = 1
+
+    def __init__(self, path="monitor_checkpoint.json"):
+        """
+        初始化断点存储
+        :param path: 断点文件路径
+        """
+        self.path = os.path.abspath(path)
+        self._last_saved = None  # 上次写入的内容（不含保存时间），用于跳过无变化的写入
+
+    def load(self):
+        """
+        读取断点
+        :return: 断点字典，不存在或损坏时返回None
+        """
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️ 断点文件读取失败，忽略: {e}")
+            return None
+
+        if not isinstance(state, dict) or state.get("version") != self.VERSION:
+            print("⚠️ 断点文件版本不匹配，忽略")
+            return None
+        return state
+
+    def save(self, state, force=False):
+        """
+        原子写入断点
+        :param state: 断点内容（不需要包含 version 和 saved_at）
+        :param force: 内容没有变化时是否仍然写入
+        :return: 是否写入
+        """
+        if not force and state == self._last_saved:
+            return False
+
+        data = dict(state)
+        data["version"] = self.VERSION
+        data["saved_at"] = time.time()
+
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"⚠️ 保存断点失败: {e}")
+            return False
+
+        self._last_saved = state
+        return True
+
+    def clear(self):
+        """删除断点文件"""
+        self._last_saved = None
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
@@ -0,0 +1,261 @@
+"""
+切换命令规则模块
+功能：
+1. 触发词、修饰数字（如108）、运算和特殊别名都在 obs_config.json 的 command_rules 节中声明
+2. 加载时编译为查找表：触发词合并为一个正则，修饰数字和别名都是字典
+3. 解析一条发言只需一次数字提取和固定次数的字典查找，与规则数量无关
+4. 发言中出现场景名称或别名（如“看8米项链”）时，按最长关键词匹配场景，优先于数字
+5. 按文件编码生成字节级预过滤：不含触发词字节序列（或不含数字）的行不解码直接跳过
+"""
+
+import json
+import operator
+import re
+from keyword_matcher import build_scene_matcher
+
+# 整数或小数
+NUMBER_PATTERN = re.compile(r'\d+(?:\.\d+)?')
+
+# 数字规则能识别的数字字符：ASCII 数字和全角数字
+_DIGIT_CHARS = "0123456789０１２３４５６７８９"
+
+# 支持的运算
+OPERATIONS = {
+    "add": operator.add,
+    "subtract": operator.sub,
+    "multiply": operator.mul,
+}
+
+# 与原先硬编码规则相同的默认配置
+DEFAULT_COMMAND_RULES = {
+    "trigger_words": ["看"],
+    "modifiers": [
+        {
+            "token": "108",
+            "operation": "add",
+            "operand": 108,
+            "aliases": {"108.8": "116", "108.6": "114"},
+            "description": "N米项链108颗：看 + 108 + N -> N+108"
+        }
+    ],
+    "aliases": {}
+}
+
+
+def format_number(value):
+    """
+    把运算结果格式化为场景编号字符串（整数不带小数点）
+    :param value: 数值
+    :return: 编号字符串
+    """
+    value = float(value)
+    if value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _normalize_aliases(aliases):
+    """
+    规范化别名表的键（"108.80" 与 "108.8" 视为同一个数）
+    :param aliases: 原始别名表
+    :return: 规范化后的别名表
+    """
+    normalized = {}
+    for key, value in (aliases or {}).items():
+        try:
+            normalized[format_number(key)] = str(value)
+        except ValueError:
+            print(f"⚠️ 命令规则别名无效，已忽略: {key}")
+    return normalized
+
+
+def _encode(text, encoding):
+    """按编码转换为字节（去掉 utf-16、utf-8-sig 等编码附加的 BOM）"""
+    bom = "".encode(encoding)
+    data = text.encode(encoding)
+    return data[len(bom):] if bom and data.startswith(bom) else data
+
+
+def _bytes_alternation(sequences):
+    """把若干字节序列合并为一个正则（长的优先）"""
+    sequences = sorted(set(sequences), key=len, reverse=True)
+    return re.compile(b"|".join(map(re.escape, sequences)))
+
+
+def _encoded_time_prefix(encoding):
+    """
+    生成匹配行首时间戳（"2025-08-29 22:53:09" 或 "22:53:09"）的字节正则，
+    时间戳中的数字不算作命令中的数字
+    :param encoding: 文件编码
+    :return: 编译后的字节正则
+    """
+    digit = b"(?:" + b"|".join(re.escape(_encode(ch, encoding)) for ch in "0123456789") + b")"
+    dash = re.escape(_encode("-", encoding))
+    colon = re.escape(_encode(":", encoding))
+    space = b"(?:" + re.escape(_encode(" ", encoding)) + b"|" + re.escape(_encode("\t", encoding)) + b")"
+    date = digit + b"{4}" + dash + digit + b"{2}" + dash + digit + b"{2}" + space + b"+"
+    clock = digit + b"{2}" + colon + digit + b"{2}" + colon + digit + b"{2}"
+    return re.compile(b"(?:" + date + b")?" + clock)
+
+
+class CommandRules:
+    """编译后的切换命令规则"""
+
+    def __init__(self, rule_config=None, scenes=None, default_scene=None):
+        """
+        编译命令规则
+        :param rule_config: command_rules 配置，为None时使用默认规则
+        :param scenes: scene_settings.scenes 配置，用于按场景名称和别名匹配，为None时只按数字匹配
+        :param default_scene: 默认场景名称（不作为场景关键词）
+        """
+        rule_config = rule_config or DEFAULT_COMMAND_RULES
+        self.trigger_words = [word for word in rule_config.get("trigger_words", []) if word]
+        # 较长的触发词优先，避免被其前缀抢先匹配
+        words = sorted(self.trigger_words, key=len, reverse=True)
+        self._trigger_pattern = re.compile("|".join(map(re.escape, words))) if words else None
+
+        self.aliases = _normalize_aliases(rule_config.get("aliases"))
+        # 修饰数字 -> (运算函数, 运算数, 该修饰的别名表 + 全局别名表)
+        self.modifiers = {}
+        for modifier in rule_config.get("modifiers", []):
+            token = str(modifier.get("token", ""))
+            operation = OPERATIONS.get(modifier.get("operation", "add"))
+            if not token or operation is None:
+                print(f"⚠️ 命令规则修饰无效，已忽略: {modifier}")
+                continue
+            aliases = dict(self.aliases)
+            aliases.update(_normalize_aliases(modifier.get("aliases")))
+            self.modifiers[token] = (operation, float(modifier.get("operand", 0)), aliases)
+
+        # 场景关键词自动机：场景名称 / 别名 -> 切换命令
+        self.scene_matcher = build_scene_matcher(scenes, default_scene)
+        self._byte_filters = {}  # 编码 -> 字节级预过滤函数
+
+    def has_trigger(self, content):
+        """
+        判断发言是否包含触发词（没有配置触发词时视为都包含）
+        :param content: 发言内容
+        :return: 是否包含
+        """
+        if self._trigger_pattern is None:
+            return True
+        return self._trigger_pattern.search(content) is not None
+
+    def looks_like_command(self, content):
+        """
+        粗略判断一条发言是否可能是切换命令（包含触发词，以及数字或场景关键词）
+        需要传入去掉时间戳和用户名的发言内容，否则时间戳中的数字总能满足条件
+        :param content: 用户发言的纯净内容
+        :return: 是否可能是命令
+        """
+        if not content or not self.has_trigger(content):
+            return False
+        if any(ch.isdigit() for ch in content):
+            return True
+        return self.scene_matcher is not None and self.scene_matcher.longest_match(content) is not None
+
+    def byte_filter(self, encoding):
+        """
+        生成字节级预过滤函数：在解码之前检查原始字节中是否有触发词的编码序列，
+        以及行首时间戳之后是否有数字
+        只会放过多余的行（如用户名中的数字、UTF-16 下未对齐的匹配），不会丢掉可能是命令的行
+        :param encoding: 文件编码
+        :return: 函数 (bytes) -> bool；无法在字节层面过滤时返回None
+        """
+        if encoding in self._byte_filters:
+            return self._byte_filters[encoding]
+
+        try:
+            triggers = [_encode(word, encoding) for word in self.trigger_words]
+            digits = [_encode(ch, encoding) for ch in _DIGIT_CHARS]
+            time_prefix = _encoded_time_prefix(encoding)
+        except (LookupError, UnicodeError):
+            triggers = []
+
+        line_filter = None
+        if triggers:
+            trigger_search = _bytes_alternation(triggers).search
+            if self.scene_matcher is not None:
+                # 有非数字的场景关键词时，“看多圈”这类不含数字的行也可能是命令
+                line_filter = lambda raw: trigger_search(raw) is not None
+            else:
+                digit_search = _bytes_alternation(digits).search
+                prefix_match = time_prefix.match
+
+                def line_filter(raw):
+                    if trigger_search(raw) is None:
+                        return False
+                    prefix = prefix_match(raw)
+                    return digit_search(raw, prefix.end() if prefix else 0) is not None
+
+        self._byte_filters[encoding] = line_filter
+        return line_filter
+
+    def resolve(self, content):
+        """
+        解析发言中的场景编号
+        1. 包含场景名称或别名：返回最长关键词对应场景的切换命令
+        2. 有修饰数字且还有其他数字：对第一个其他数字做修饰运算
+        3. 只有修饰数字：不是命令
+        4. 没有修饰数字：返回第一个数字
+        数字结果再经过别名表转换
+        :param content: 用户发言的纯净内容
+        :return: 场景编号字符串或None
+        """
+        if not content or not self.has_trigger(content):
+            return None
+
+        if self.scene_matcher is not None:
+            match = self.scene_matcher.longest_match(content)
+            if match is not None:
+                return match[2]
+
+        modifier = None
+        base = None
+        for number in NUMBER_PATTERN.findall(content):
+            rule = self.modifiers.get(number)
+            if rule is not None:
+                if modifier is None:
+                    modifier = rule
+            elif base is None:
+                base = number
+            if modifier is not None and base is not None:
+                break
+
+        if base is None:
+            return None
+        if modifier is None:
+            return self.aliases.get(base, base)
+
+        operation, operand, aliases = modifier
+        try:
+            result = format_number(operation(float(base), operand))
+        except ValueError:
+            return None
+        return aliases.get(result, result)
+
+
+def compile_command_rules(config):
+    """
+    根据完整配置编译命令规则（command_rules 节 + 场景关键词）
+    :param config: 配置字典，可以为None
+    :return: CommandRules 实例
+    """
+    config = config or {}
+    scene_settings = config.get("scene_settings") or {}
+    return CommandRules(config.get("command_rules"), scenes=scene_settings.get("scenes"),
+                        default_scene=scene_settings.get("default_scene"))
+
+
+def load_command_rules(config_path="obs_config.json"):
+    """
+    读取并编译配置文件中的命令规则
+    :param config_path: 配置文件路径
+    :return: CommandRules 实例，读取失败或未配置时使用默认规则
+    """
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError):
+        config = None
+    return compile_command_rules(config if isinstance(config, dict) else None)
@@ -0,0 +1,167 @@
+"""
+配置编译与热加载模块
+功能：
+1. 把 obs_config.json 编译为只读的 CompiledConfig：场景查找表、命令规则、切换延迟、保持时间、默认场景和待切换队列设置
+2. 热路径只读取 CompiledConfig 的属性，不再逐层查找嵌套字典
+3. ConfigWatcher 在后台轮询配置文件，变化时重新编译，再用一次引用赋值整体替换，
+   正在进行的切换要么看到旧配置，要么看到新配置，不会看到一半
+4. 修改配置文件后无需重启程序
+"""
+
+import itertools
+import json
+import threading
+import time
+
+from command_rules import compile_command_rules
+from pending_requests import POLICIES
+from poll_watcher import AdaptivePoller
+from scene_resolver import SceneResolver
+
+# 全局递增的配置版本号（多个管理器共享配置时也不会重复）
+_versions = itertools.count(1)
+
+
+class CompiledConfig:
+    """编译后的只读配置"""
+
+    __slots__ = ("version", "raw", "scene_resolver", "command_rules",
+                 "default_scene", "switch_duration", "switch_delay", "vote_window",
+                 "pending_policy", "pending_max_size", "pending_max_age")
+
+    def __init__(self, raw, version):
+        """
+        编译配置
+        :param raw: 配置字典
+        :param version: 配置版本号
+        """
+        scene_settings = raw.get("scene_settings") or {}
+        pending = scene_settings.get("pending_queue") or {}
+        pending_policy = pending.get("policy", "latest_wins") if pending.get("enabled", False) else None
+        if pending_policy is not None and pending_policy not in POLICIES:
+            print(f"⚠️ 未知的待切换队列策略 {pending_policy}，使用 latest_wins")
+            pending_policy = "latest_wins"
+        values = {
+            "version": version,
+            "raw": raw,
+            "scene_resolver": SceneResolver.from_config(raw),
+            "command_rules": compile_command_rules(raw),
+            "default_scene": scene_settings.get("default_scene"),
+            "switch_duration": scene_settings.get("switch_duration", 120),
+            "switch_delay": scene_settings.get("switch_delay", 5),
+            "vote_window": scene_settings.get("vote_window", 0),
+            # 冷却期待切换队列，未启用时 pending_policy 为None
+            "pending_policy": pending_policy,
+            "pending_max_size": pending.get("max_size", 5),
+            "pending_max_age": pending.get("max_age", 300),
+        }
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledConfig 是只读的，请重新编译后整体替换")
+
+    def __delattr__(self, name):
+        raise AttributeError("CompiledConfig 是只读的，请重新编译后整体替换")
+
+
+def compile_config(config):
+    """
+    编译配置并分配新的版本号
+    :param config: 配置字典
+    :return: CompiledConfig 实例，配置为None时返回None
+    """
+    if not config:
+        return None
+    return CompiledConfig(config, next(_versions))
+
+
+def read_config(config_path):
+    """
+    读取配置文件
+    :param config_path: 配置文件路径
+    :return: 配置字典，读取失败时返回None
+    """
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except OSError as e:
+        print(f"❌ 读取配置文件失败: {e}")
+        return None
+    except json.JSONDecodeError as e:
+        print(f"❌ 配置文件格式错误: {e}")
+        return None
+    if not isinstance(config, dict):
+        print("❌ 配置文件格式错误: 顶层不是对象")
+        return None
+    return config
+
+
+class ConfigWatcher:
+    """后台监视配置文件，变化时重新编译并通知订阅者"""
+
+    def __init__(self, config_path, config=None, min_interval=0.5, max_interval=2.0):
+        """
+        初始化配置监视器
+        :param config_path: 配置文件路径
+        :param config: 当前已加载的配置（内容相同的写入不会触发重新加载）
+        :param min_interval: 最短轮询间隔（秒）
+        :param max_interval: 最长轮询间隔（秒）
+        """
+        self.config_path = config_path
+        self._config = config
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.reload_count = 0
+        self.poller = AdaptivePoller(
+            lambda: self.config_path,
+            self.reload,
+            min_interval=min_interval,
+            max_interval=max_interval
+        )
+
+    def add_listener(self, callback):
+        """
+        订阅配置变化
+        :param callback: 函数 (CompiledConfig) -> None
+        """
+        self._listeners.append(callback)
+
+    def start(self):
+        """开始在后台监视配置文件"""
+        self.poller.start()
+
+    def stop(self):
+        """停止监视"""
+        self.poller.stop()
+
+    def reload(self):
+        """
+        重新读取并编译配置，内容有变化时通知所有订阅者
+        读取或编译失败时保留旧配置
+        :return: 是否应用了新配置
+        """
+        with self._lock:
+            config = read_config(self.config_path)
+            if config is None:
+                print("⚠️ 配置文件重新加载失败，继续使用旧配置")
+                return False
+            if config == self._config:
+                # 内容没有变化（如程序自己保存了相同的配置）
+                return False
+            try:
+                compiled = compile_config(config)
+            except Exception as e:
+                print(f"❌ 编译配置失败，继续使用旧配置: {e}")
+                return False
+            self._config = config
+            self.reload_count += 1
+
+        timestamp = time.strftime('%H:%M:%S')
+        print(f"\n🔄 [{timestamp}] 配置文件已变化，已重新加载（版本 {compiled.version}）")
+        for callback in list(self._listeners):
+            try:
+                callback(compiled)
+            except Exception as e:
+                print(f"⚠️ 应用新配置失败: {e}")
+        return True
@@ -0,0 +1,109 @@
+"""
+解析结果缓存模块
+功能：
+1. 直播间里大量重复的刷屏发言（如“看8”、“看看12”）只解析和查找场景一次
+2. 按发言内容缓存提取到的切换命令和目标场景，超过容量时淘汰最久未使用的条目
+3. 场景配置或命令规则变化时整体失效
+4. 提供命中率统计，用于调整缓存大小
+"""
+
+import threading
+from collections import OrderedDict
+
+
+def normalize_speech(content):
+    """
+    规范化发言内容作为缓存键（合并连续空白）
+    :param content: 用户发言的纯净内容
+    :return: 缓存键
+    """
+    return " ".join(content.split())
+
+
+class LRUCache:
+    """有容量上限的 LRU 缓存"""
+
+    def __init__(self, max_size=1024):
+        """
+        初始化缓存
+        :param max_size: 最多缓存的条目数
+        """
+        self.max_size = max(1, max_size)
+        self.version = None     # 缓存内容对应的配置版本
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        """
+        读取缓存并标记为最近使用
+        :param key: 缓存键
+        :param default: 未命中时的返回值
+        :return: 缓存的值
+        """
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        写入缓存，超过容量时淘汰最久未使用的条目
+        :param key: 缓存键
+        :param value: 缓存的值
+        """
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def validate(self, version):
+        """
+        检查配置版本，版本变化时清空缓存
+        :param version: 当前配置版本
+        :return: 是否清空了缓存
+        """
+        with self._lock:
+            if version == self.version:
+                return False
+            had_data = bool(self._data)
+            self._data.clear()
+            self.version = version
+            if had_data:
+                self.invalidations += 1
+            return had_data
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def get_stats(self):
+        """
+        获取缓存统计
+        :return: 统计字典
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
@@ -0,0 +1,91 @@
+"""
+重复发言过滤模块
+功能：
+1. 同一用户在时间窗口内重复发送的相同内容只放行第一条，其余在解析之前丢弃
+2. 只保存 (用户, 内容) 的哈希值和过期时间，条目数有上限，长时间刷屏内存也不会增长
+3. 统计放行和丢弃的行数
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# 行首的时间戳（"2025-08-29 22:53:09" 或 "22:53:09"），去掉后剩下的部分即用户和内容
+_TIME_PREFIX = re.compile(r'(?:\d{4}-\d{2}-\d{2}\s+)?\d{2}:\d{2}:\d{2}\s*')
+
+
+def dedupe_key(line):
+    """
+    计算一行的去重键：去掉行首时间戳后对 (用户, 内容) 部分求哈希
+    :param line: 日志行
+    :return: 整数哈希值
+    """
+    if line[:1].isdigit():
+        match = _TIME_PREFIX.match(line)
+        if match:
+            line = line[match.end():]
+    return hash(line.strip())
+
+
+class DuplicateFilter:
+    """滑动时间窗口内的重复行过滤器"""
+
+    def __init__(self, window=5.0, max_entries=10000):
+        """
+        初始化过滤器
+        :param window: 去重时间窗口（秒）：第一条放行后，窗口内的相同行都被丢弃
+        :param max_entries: 最多记住的不同行数，超过时淘汰最早的
+        """
+        self.window = window
+        self.max_entries = max(1, max_entries)
+        # 哈希值 -> 窗口截止时间；窗口长度固定，插入顺序即截止时间顺序
+        self._expires = OrderedDict()
+        self._lock = threading.Lock()
+        self.passed = 0
+        self.dropped = 0
+        self.evicted = 0
+
+    def allow(self, line, now=None):
+        """
+        判断一行是否放行
+        :param line: 日志行
+        :param now: 当前时间（秒，单调时钟），为None时自动获取
+        :return: True 表示放行，False 表示是窗口内的重复行
+        """
+        key = dedupe_key(line)
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            expires = self._expires
+            # 清理已过期的条目（都在队首）
+            while expires:
+                oldest_key, oldest_expiry = next(iter(expires.items()))
+                if oldest_expiry > now:
+                    break
+                del expires[oldest_key]
+
+            if key in expires:
+                self.dropped += 1
+                return False
+
+            expires[key] = now + self.window
+            if len(expires) > self.max_entries:
+                expires.popitem(last=False)
+                self.evicted += 1
+            self.passed += 1
+            return True
+
+    def get_stats(self):
+        """
+        获取过滤统计
+        :return: 统计字典
+        """
+        with self._lock:
+            return {
+                'window': self.window,
+                'entries': len(self._expires),
+                'max_entries': self.max_entries,
+                'passed': self.passed,
+                'dropped': self.dropped,
+                'evicted': self.evicted
+            }
@@ -1,29 +1,118 @@
 import os
 import time
-import glob
 import signal
 import sys
+import json
+import threading
 from datetime import datetime
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from obs_manager import OBSManager
+from log_tailer import LogTailer, read_last_line
+from speech_log_index import SpeechLogIndex, is_user_speech_log
+from work_queue import BoundedWorkQueue
+from poll_watcher import AdaptivePoller
+from checkpoint import CheckpointStore
+from stream_merge import TimestampMerger
+from speech_parser import extract_user_speech, extract_number_with_kan, split_speech, parse_log_time
+from command_rules import CommandRules
+from decision_cache import LRUCache, normalize_speech
+from dedupe_filter import DuplicateFilter
+from compiled_config import ConfigWatcher
 
 class FileMonitor(FileSystemEventHandler):
     """文件监控类，监控指定文件的变化"""
     
-    def __init__(self, file_path, obs_manager=None):
+    def __init__(self, file_path, obs_manager=None, check_interval=600, log_index=None,
+                 queue_size=1000, queue_policy="drop_non_command", backend="auto",
+                 poll_min_interval=0.1, poll_max_interval=2.0, stall_timeout=3.0, encoding=None,
+                 checkpoint_path=None, catch_up_window=60, catch_up_max_bytes=256 * 1024, room_name=None,
+                 merge_streams=False, reorder_window=1.0, active_window=3600, command_rules=None,
+                 cache_size=1024, dedupe_window=5.0, dedupe_max_entries=10000, byte_prefilter=True):
         """
         初始化文件监控器
         :param file_path: 要监控的文件路径
         :param obs_manager: OBS管理器实例
+        :param check_interval: 兜底检查新文件的间隔（秒）
+        :param log_index: 日志目录的文件索引，为None时自动创建
+        :param queue_size: 待处理行队列的最大长度
+        :param queue_policy: 队列满时的策略（block / drop_oldest / drop_non_command）
+        :param backend: 监控方式，"watchdog" 仅文件事件，"polling" 仅轮询，
+                        "auto" 先用文件事件，检测到事件停止时自动切换为轮询
+        :param poll_min_interval: 轮询最短间隔（秒）
+        :param poll_max_interval: 轮询最长间隔（秒）
+        :param stall_timeout: 文件增长但没有收到事件超过此时间（秒）即判定事件丢失
+        :param encoding: 日志文件编码，为None时按文件自动检测（BOM + 采样）
+        :param checkpoint_path: 断点文件路径，为None时不保存断点
+        :param catch_up_window: 重启后补处理停机期间日志的时间窗口（秒）
+        :param catch_up_max_bytes: 重启后最多补读的字节数
+        :param room_name: 直播间名称（多直播间模式下用于区分输出）
+        :param merge_streams: 是否同时读取所有活跃的发言记录文件，并按日志时间合并为一个流
+        :param reorder_window: 合并时的乱序等待窗口（秒）
+        :param active_window: 最近多少秒内修改过的发言记录文件视为活跃
+        :param command_rules: 编译后的切换命令规则（CommandRules），为None时使用默认规则
+        :param cache_size: 解析结果缓存的最大条目数，为0时不缓存
+        :param dedupe_window: 同一用户重复发言的去重窗口（秒），为0时不去重
+        :param dedupe_max_entries: 去重时最多记住的不同发言数
+        :param byte_prefilter: 是否在解码之前按原始字节跳过不可能是命令的行
         """
         self.file_path = os.path.abspath(file_path)
         self.file_dir = os.path.dirname(self.file_path)
         self.file_name = os.path.basename(self.file_path)
         self.last_modified_time = 0
-        self.check_interval = 600  # 10分钟 = 600秒
+        self.room_name = room_name
+        self.check_interval = check_interval  # 新文件兜底检查间隔（秒）
+        self._next_rotation_check = time.monotonic() + check_interval
         self.content_check_interval = 0.5  # 0.5秒
         self.obs_manager = obs_manager
+        self.command_rules = command_rules or CommandRules()
+        # 重复发言（刷屏）的解析结果缓存：发言内容 -> (切换命令, 目标场景)
+        self.decision_cache = LRUCache(cache_size) if cache_size > 0 else None
+        # 发言记录文件索引：由文件事件增量维护，避免每次都扫描整个目录
+        self.log_index = log_index or SpeechLogIndex(self.file_dir)
+        # 增量读取器：保持文件句柄打开，只读取新追加的内容
+        self.encoding = encoding
+        self.byte_prefilter = byte_prefilter
+        self._retired_rejected_lines = 0  # 已关闭的读取器跳过的行数（文件切换后仍计入统计）
+        self.tailer = self._create_tailer(self.file_path)
+        # 监控线程与定期检查线程都会读取文件，需要互斥
+        self.tail_lock = threading.RLock()
+        # 解析、OBS切换和统计写库都在独立的处理线程中执行，不阻塞文件事件线程
+        self.work_queue = BoundedWorkQueue(
+            self._handle_entry,
+            max_size=queue_size,
+            policy=queue_policy,
+            is_command=self._looks_like_command
+        )
+        self._last_reported_drops = 0
+        self._last_queue_report = 0
+        # 刷屏去重：同一用户窗口内的相同发言在进入处理队列之前丢弃
+        self.dedupe_filter = DuplicateFilter(dedupe_window, dedupe_max_entries) if dedupe_window > 0 else None
+        self._last_reported_duplicates = 0
+        self._last_dedupe_report = 0
+        # 轮询备用监控：网络共享目录上文件事件不可靠时使用
+        self.backend = backend
+        self.stall_timeout = stall_timeout
+        self.poller = AdaptivePoller(
+            lambda: self.file_path,
+            self.process_new_lines,
+            min_interval=poll_min_interval,
+            max_interval=poll_max_interval
+        )
+        self._growth_seen_at = None  # 首次发现文件增长但未收到事件的时间
+        # 断点：记录已处理到的位置和OBS切换状态，重启后从断点继续
+        self.checkpoint = CheckpointStore(checkpoint_path) if checkpoint_path else None
+        self.catch_up_window = catch_up_window
+        self.catch_up_max_bytes = catch_up_max_bytes
+        self.processed_position = (self.tailer.identity, self.tailer.committed_offset)
+        # 多文件合并：FlyAiLive 可能同时写多个发言记录文件（多平台、中途重启）
+        # self.tailer 仍是主文件（用于断点和事件丢失检测），其他活跃文件的读取器保存在 stream_tailers 中
+        self.merge_streams = merge_streams
+        self.active_window = active_window
+        self.stream_tailers = {}
+        self.merger = TimestampMerger(reorder_window) if merge_streams else None
+        if merge_streams:
+            self._discover_streams()
         
         # 检查文件是否存在
         if not os.path.exists(self.file_path):
@@ -31,6 +120,42 @@ class FileMonitor(FileSystemEventHandler):
         else:
             self.last_modified_time = os.path.getmtime(self.file_path)
             self._print_info(f"开始监控文件: {os.path.basename(self.file_path)}")
+            if self.tailer.encoding:
+                print(f"   🔤 文件编码: {self.tailer.encoding}")
+    
+    @classmethod
+    def from_settings(cls, file_path, obs_manager, settings, **overrides):
+        """
+        根据配置文件 monitoring 节创建文件监控器
+        :param file_path: 要监控的文件路径
+        :param obs_manager: OBS管理器实例
+        :param settings: 监控参数字典（load_monitor_settings 的返回值）
+        :param overrides: 直接传给构造函数的参数（如 log_index、room_name）
+        :return: FileMonitor 实例
+        """
+        encoding = settings.get("encoding", "auto")
+        kwargs = {
+            "check_interval": settings.get("rotation_check_interval", 600),
+            "queue_size": settings.get("queue_size", 1000),
+            "queue_policy": settings.get("queue_policy", "drop_non_command"),
+            "backend": settings.get("backend", "auto"),
+            "poll_min_interval": settings.get("poll_min_interval", 0.1),
+            "poll_max_interval": settings.get("poll_max_interval", 2.0),
+            "stall_timeout": settings.get("stall_timeout", 3.0),
+            "encoding": None if encoding == "auto" else encoding,
+            "checkpoint_path": settings.get("checkpoint_file", "monitor_checkpoint.json"),
+            "catch_up_window": settings.get("catch_up_window", 60),
+            "catch_up_max_bytes": settings.get("catch_up_max_bytes", 256 * 1024),
+            "merge_streams": settings.get("merge_streams", False),
+            "reorder_window": settings.get("reorder_window", 1.0),
+            "active_window": settings.get("active_window", 3600),
+            "cache_size": settings.get("cache_size", 1024),
+            "dedupe_window": settings.get("dedupe_window", 5.0),
+            "dedupe_max_entries": settings.get("dedupe_max_entries", 10000),
+            "byte_prefilter": settings.get("byte_prefilter", True),
+        }
+        kwargs.update(overrides)
+        return cls(file_path, obs_manager, **kwargs)
     
     def _print_info(self, message):
         """打印信息消息"""
@@ -72,110 +197,61 @@ class FileMonitor(FileSystemEventHandler):
         - [用户发言]用户名： 内容
         - 时间 用户名： 内容
         """
-        if not line or not line.strip():
-            return "空内容"
-        
-        original_line = line.strip()
-        
-        # 匹配模式1: 2025-08-29 22:53:09[用户发言]t： 有黄水吗
-        import re
-        pattern1 = r'\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2}\[用户发言\][^：]*：\s*(.*)'
-        match1 = re.match(pattern1, original_line)
-        if match1:
-            content = match1.group(1).strip()
-            return content if content else "空内容"
-        
-        # 匹配模式2: [用户发言]用户名： 内容
-        pattern2 = r'\[用户发言\][^：]*：\s*(.*)'
-        match2 = re.match(pattern2, original_line)
-        if match2:
-            content = match2.group(1).strip()
-            return content if content else "空内容"
-        
-        # 匹配模式3: 时间戳 用户名： 内容
-        pattern3 = r'\d{2}:\d{2}:\d{2}\s+[^：]*：\s*(.*)'
-        match3 = re.match(pattern3, original_line)
-        if match3:
-            content = match3.group(1).strip()
-            return content if content else "空内容"
-        
-        # 如果没有匹配到任何模式，返回原始内容
-        return original_line
+        return extract_user_speech(line)
     
     def _extract_number_with_kan(self, content):
         """
-        检测用户发言内容中是否同时包含"看"字和数字
-        支持两种规则：
-        1. 包含"看"字和"108"字符，且还有其他数字：返回其他数字+108
-        2. 包含"看"字和数字（普通情况）：返回提取到的数字
+        检测用户发言内容中是否同时包含触发词（如"看"字）和数字
+        换算规则（如 看 + 108 + N -> N+108）在配置文件 command_rules 节中声明
         
         :param content: 用户发言的纯净内容
         :return: 提取到的数字字符串或None
         """
-        import re
-        
-        if not content or not content.strip():
-            return None
-        
-        # 检查是否包含"看"字
-        if "看" not in content:
-            return None
-        
-        # 规则1: 检查是否包含"看"字和"108"字符
-        if "108" in content:
-            # 提取所有数字（包括整数和小数）
-            number_pattern = r'\d+(?:\.\d+)?'
-            numbers = re.findall(number_pattern, content)
-            
-            # 过滤掉"108"，查找其他数字
-            other_numbers = [num for num in numbers if num != "108"]
-            
-            if other_numbers:
-                # 返回第一个其他数字+108
-                try:
-                    base_number = float(other_numbers[0])
-                    result = base_number + 108
-                    
-                    # 特殊处理：如果结果是108.8，对应8米项链108颗场景，返回116
-                    if result == 108.8:
-                        return "116"
-                    # 特殊处理：如果结果是108.6，对应6米项链108颗场景，返回114  
-                    elif result == 108.6:
-                        return "114"
-                    
-                    # 如果结果是整数，返回整数字符串
-                    if result.is_integer():
-                        return str(int(result))
-                    else:
-                        return str(result)
-                except ValueError:
-                    return None
-            else:
-                # 只有108，没有其他数字
-                return None
-        
-        # 规则2: 普通情况，提取所有数字（包括整数和小数）
-        number_pattern = r'\d+(?:\.\d+)?'
-        numbers = re.findall(number_pattern, content)
+        return extract_number_with_kan(content, self.command_rules)
+    
+    def _resolve_decision(self, content):
+        """
+        解析一行并查找目标场景，相同的发言内容直接使用缓存结果
+        :param content: 日志行
+        :return: (SpeechRecord, (目标场景, 最终切换命令) 或None)
+        """
+        record = split_speech(content)
+        if self.decision_cache is None:
+            record.command = self.command_rules.resolve(record.content)
+            return record, None
         
-        if numbers:
-            # 如果有多个数字，返回第一个
-            return numbers[0]
+        # 场景配置或命令规则变化时缓存整体失效
+        config_version = self.obs_manager.config_version if self.obs_manager else 0
+        if self.decision_cache.validate((config_version, id(self.command_rules))):
+            self._print_info("场景配置已变化，清空解析结果缓存")
         
-        return None
+        key = normalize_speech(record.content)
+        decision = self.decision_cache.get(key)
+        if decision is None:
+            number = self.command_rules.resolve(record.content)
+            resolved = None
+            if number is not None and self.obs_manager and self.obs_manager.compiled:
+                resolved = self.obs_manager.resolve_scene(number)
+            decision = (number, resolved)
+            self.decision_cache.put(key, decision)
+        record.command, resolved = decision
+        return record, resolved
     
-    def _print_content_change(self, content):
-        """打印文件内容变化"""
+    def _print_content_change(self, content, path=None):
+        """
+        打印文件内容变化
+        :param content: 日志行
+        :param path: 该行所在的文件（文件切换后队列中可能还有旧文件的行），为None时使用当前监控文件
+        """
         timestamp = time.strftime('%H:%M:%S')
         
-        # 提取纯净的用户发言内容
-        clean_content = self._extract_user_speech(content)
-        
-        # 检测是否包含"看"字和数字
-        extracted_number = self._extract_number_with_kan(clean_content)
+        # 提取纯净的用户发言内容，并检测是否包含"看"字和数字
+        record, resolved = self._resolve_decision(content)
+        clean_content = record.content
+        extracted_number = record.command
         
-        print(f"\n📄 [{timestamp}] 文件内容变化")
-        print(f"   📁 文件: {os.path.basename(self.file_path)}")
+        print(f"\n📄 [{timestamp}] 文件内容变化{self._room_label()}")
+        print(f"   📁 文件: {os.path.basename(path or self.file_path)}")
         print(f"   📝 原始内容: {content}")
         print(f"   ✨ 用户发言: {clean_content}")
         
@@ -185,18 +261,25 @@ class FileMonitor(FileSystemEventHandler):
             
             # OBS场景自动切换
             if self.obs_manager and self.obs_manager.connected:
-                if self.obs_manager.is_in_cooldown():
+                compiled = self.obs_manager.compiled
+                in_cooldown = self.obs_manager.is_in_cooldown()
+                if in_cooldown and not compiled.pending_policy:
                     remaining = self.obs_manager.get_cooldown_remaining()
                     self._print_obs_status(f"场景切换冷却中，剩余 {remaining:.0f} 秒", "warning")
                 else:
-                    success = self.obs_manager.switch_scene_by_number(extracted_number, clean_content)
+                    success = self.obs_manager.switch_scene_by_record(record, resolved=resolved)
                     if success:
                         # 检查是否有延迟设置
-                        delay = self.obs_manager.config["scene_settings"].get("switch_delay", 5)
-                        if delay > 0:
+                        delay = compiled.switch_delay
+                        vote_window = compiled.vote_window
+                        if in_cooldown:
+                            self._print_obs_status("场景切换冷却中，请求已排队，冷却结束后切换", "info")
+                        elif vote_window > 0:
+                            self._print_obs_status("切换请求已计入投票，窗口结束后切换到票数最多的场景", "info")
+                        elif delay > 0:
                             self._print_obs_status(f"场景切换命令已发出，{delay}秒后执行", "info")
                         else:
-                            self._print_obs_status(f"场景已切换到编号 {extracted_number}", "success")
+                            self._print_obs_status(f"正在切换到编号 {extracted_number} 的场景", "success")
                     else:
                         self._print_obs_status(f"无法切换到编号 {extracted_number} 的场景", "error")
             elif self.obs_manager and not self.obs_manager.connected:
@@ -217,119 +300,542 @@ class FileMonitor(FileSystemEventHandler):
     def get_last_line(self):
         """获取文件的最后一行内容"""
         try:
-            with open(self.file_path, 'r', encoding='utf-8') as file:
-                lines = file.readlines()
-                if lines:
-                    # 去除末尾的换行符
-                    last_line = lines[-1].strip()
-                    return last_line if last_line else "最后一行为空"
-                else:
-                    return "文件为空"
+            # 从文件末尾反向查找，避免把整个文件读入内存
+            last_line = read_last_line(self.file_path, encoding=self.encoding)
+            if last_line is None:
+                return "文件为空"
+            return last_line if last_line else "最后一行为空"
         except FileNotFoundError:
             return "文件不存在"
         except Exception as e:
             return f"读取文件出错: {str(e)}"
     
+    def _create_tailer(self, path, start_at_end=True):
+        """
+        创建增量读取器（启用字节预过滤时，不含触发词和数字的行不解码）
+        :param path: 文件路径
+        :param start_at_end: 是否从文件末尾开始读取
+        :return: LogTailer 实例
+        """
+        line_filter = self._byte_filter if self.byte_prefilter else None
+        return LogTailer(path, encoding=self.encoding, start_at_end=start_at_end, line_filter=line_filter)
+    
+    def apply_config(self, compiled):
+        """
+        应用重新加载的配置：替换命令规则（解析结果缓存和字节预过滤随之更新）
+        :param compiled: CompiledConfig 实例
+        """
+        self.command_rules = compiled.command_rules
+    
+    def _retire_tailer(self, tailer):
+        """
+        关闭不再使用的读取器，保留它的预过滤计数
+        :param tailer: LogTailer 实例
+        """
+        self._retired_rejected_lines += tailer.rejected_lines
+        tailer.close()
+    
+    @property
+    def rejected_lines(self):
+        """字节预过滤跳过的总行数（包括文件切换前的旧文件）"""
+        return (self._retired_rejected_lines + self.tailer.rejected_lines
+                + sum(tailer.rejected_lines for tailer in list(self.stream_tailers.values())))
+    
+    def _byte_filter(self, encoding):
+        """
+        按当前命令规则获取字节级预过滤函数（规则重新加载后自动使用新规则）
+        :param encoding: 文件编码
+        :return: 函数 (bytes) -> bool 或None
+        """
+        return self.command_rules.byte_filter(encoding)
+    
+    def _set_tail_target(self, new_file, start_at_end=True):
+        """
+        更新监控目标并重建增量读取器
+        :param new_file: 新的监控文件路径
+        :param start_at_end: 是否从新文件末尾开始读取
+        """
+        new_file = os.path.abspath(new_file)
+        if self.merge_streams:
+            # 合并模式下旧文件可能还在写入，保留为次要流继续读取
+            self.stream_tailers[self.file_path] = self.tailer
+            existing = self.stream_tailers.pop(new_file, None)
+        else:
+            self._retire_tailer(self.tailer)
+            existing = None
+        self.file_path = new_file
+        self.file_name = os.path.basename(self.file_path)
+        self.last_modified_time = os.path.getmtime(self.file_path) if os.path.exists(self.file_path) else 0
+        self.tailer = existing or self._create_tailer(self.file_path, start_at_end)
+        if start_at_end:
+            self.processed_position = (self.tailer.identity, self.tailer.committed_offset)
+    
+    def _print_new_file_state(self):
+        """显示新文件最后一行的解析结果"""
+        last_line = self.get_last_line()
+        clean_content = self._extract_user_speech(last_line)
+        extracted_number = self._extract_number_with_kan(clean_content)
+        print(f"   📝 新文件原始内容: {last_line}")
+        print(f"   ✨ 新文件用户发言: {clean_content}")
+        if extracted_number is not None:
+            print(f"   🔢 检测结果: 发现“看”字和数字 -> {extracted_number}")
+        else:
+            print(f"   ❌ 检测结果: 未检测到“看”字和数字的组合")
+    
+    def _switch_to_file(self, new_file, start_at_end=True):
+        """
+        切换监控目标：先把旧文件读到末尾，再切换到新文件
+        :param new_file: 新的监控文件路径
+        :param start_at_end: True 时只显示新文件最后一行并从末尾开始；
+                             False 时从头处理新文件中已写入的每一行
+        """
+        with self.tail_lock:
+            old_file = self.file_path
+            # 先读完旧文件句柄中剩余的内容
+            self.process_new_lines()
+            # 更新监控目标
+            self._set_tail_target(new_file, start_at_end=start_at_end)
+            
+            self._print_file_switch(old_file, new_file)
+            if start_at_end:
+                # 显示新文件的最后一行
+                self._print_new_file_state()
+            else:
+                self.process_new_lines()
+    
+    def process_new_lines(self):
+        """读取自上次读取以来追加的每一行，放入处理队列"""
+        with self.tail_lock:
+            if self.merge_streams:
+                return self._process_merged_lines()
+            entries = self.tailer.read_new_entries()
+            for entry in entries:
+                self._enqueue(entry)
+            return len(entries)
+    
+    def _enqueue(self, entry):
+        """
+        把一行放入处理队列（窗口内重复的发言直接丢弃，不进入解析）
+        :param entry: (文本行, 文件路径, 文件标识, 行结束偏移)
+        """
+        if self.dedupe_filter is None or self.dedupe_filter.allow(entry[0]):
+            self.work_queue.put(entry)
+    
+    def _process_merged_lines(self):
+        """
+        读取所有活跃文件的新行，按日志时间归并后放入处理队列
+        乱序窗口内的行暂存在归并堆中，由后续读取或 tick() 放行
+        :return: 读取的行数
+        """
+        count = 0
+        for path, tailer in [(self.file_path, self.tailer)] + list(self.stream_tailers.items()):
+            for entry in tailer.read_new_entries():
+                self.merger.push(path, parse_log_time(entry[0]), entry)
+                count += 1
+        self._release_merged()
+        return count
+    
+    def _release_merged(self, flush=False):
+        """
+        把归并堆中已确定顺序的行放入处理队列
+        :param flush: 是否不等待乱序窗口，放行全部
+        """
+        with self.tail_lock:
+            ready = self.merger.flush() if flush else self.merger.pop_ready()
+            for entry in ready:
+                self._enqueue(entry)
+    
+    def _add_stream(self, path, start_at_end=True):
+        """
+        开始读取一个次要的发言记录文件
+        :param path: 文件路径
+        :param start_at_end: 是否从文件末尾开始读取
+        """
+        path = os.path.abspath(path)
+        with self.tail_lock:
+            if path == self.file_path or path in self.stream_tailers:
+                return
+            self.stream_tailers[path] = self._create_tailer(path, start_at_end)
+        self._print_info(f"同时监控发言记录文件: {os.path.basename(path)}")
+    
+    def _remove_stream(self, path):
+        """
+        读完并停止读取一个次要的发言记录文件
+        :param path: 文件路径
+        """
+        with self.tail_lock:
+            tailer = self.stream_tailers.pop(path, None)
+            if not tailer:
+                return
+            for entry in tailer.read_new_entries():
+                self.merger.push(path, parse_log_time(entry[0]), entry)
+            self._retire_tailer(tailer)
+            self.merger.forget(path)
+        self._print_info(f"停止监控不活跃的文件: {os.path.basename(path)}")
+    
+    def _discover_streams(self):
+        """把目录中最近修改过的发言记录文件加入合并读取"""
+        self.log_index.scan()
+        cutoff = time.time() - self.active_window
+        for path in self.log_index.paths():
+            # 索引中缓存的 stat 可能已过期，这里重新获取修改时间
+            try:
+                active = os.path.getmtime(path) >= cutoff
+            except OSError:
+                active = False
+            if active:
+                self._add_stream(path)
+    
+    def _prune_streams(self):
+        """停止读取超过 active_window 未修改的次要文件"""
+        cutoff = time.time() - self.active_window
+        for path in list(self.stream_tailers):
+            try:
+                inactive = os.path.getmtime(path) < cutoff
+            except OSError:
+                inactive = True
+            if inactive:
+                self._remove_stream(path)
+    
+    def _handle_entry(self, entry):
+        """
+        处理队列中的一行（在处理线程中执行）
+        :param entry: (文本行, 文件路径, 文件标识, 行结束偏移)
+        """
+        line, path, identity, end_offset = entry
+        self._print_content_change(line, path)
+        # 断点只记录主文件的位置，其他文件的行不影响
+        if not self.merge_streams or identity == self.tailer.identity:
+            self.processed_position = (identity, end_offset)
+    
+    def _looks_like_command(self, entry):
+        """
+        粗略判断一行是否可能是切换命令（发言内容包含触发词和数字），供队列溢出策略使用
+        只检查去掉时间戳和用户名之后的发言内容，行首时间戳中的数字不算
+        :param entry: (文本行, 文件路径, 文件标识, 行结束偏移)
+        :return: 是否可能是命令
+        """
+        return self.command_rules.looks_like_command(split_speech(entry[0]).content)
+    
+    def save_checkpoint(self, force=False):
+        """
+        保存断点（内容无变化时跳过写入）
+        :param force: 是否强制写入
+        """
+        if not self.checkpoint:
+            return
+        
+        if not self.merge_streams:
+            with self.tail_lock:
+                # 预过滤或去重跳过的行不经过处理线程；队列空闲时已读的内容都已处理完，断点推进到读取位置
+                if self.work_queue.idle:
+                    self.processed_position = (self.tailer.identity, self.tailer.committed_offset)
+        identity, offset = self.processed_position
+        state = {
+            "file": {
+                "path": self.file_path,
+                "dev": identity[0] if identity else None,
+                "ino": identity[1] if identity else None,
+                "offset": offset
+            },
+            "obs": self.obs_manager.export_state() if self.obs_manager else None
+        }
+        self.checkpoint.save(state, force=force)
+    
+    def restore_checkpoint(self):
+        """
+        从断点恢复：同一文件时从上次处理的位置继续，补处理停机期间写入的行
+        补处理的范围受 catch_up_window（按日志时间戳）和 catch_up_max_bytes 限制
+        :return: 补处理的行数
+        """
+        if not self.checkpoint:
+            return 0
+        
+        state = self.checkpoint.load()
+        if not state:
+            return 0
+        
+        if self.obs_manager and state.get("obs"):
+            self.obs_manager.restore_state(state["obs"], max_late=self.catch_up_window)
+        
+        saved_file = state.get("file") or {}
+        identity = (saved_file.get("dev"), saved_file.get("ino"))
+        offset = saved_file.get("offset")
+        if os.path.abspath(saved_file.get("path") or "") != self.file_path \
+                or identity != self.tailer.identity or offset is None:
+            self._print_info("断点对应的文件已不是当前文件，从文件末尾开始监控")
+            return 0
+        
+        with self.tail_lock:
+            unread = self.tailer.offset - offset
+            if unread < 0:
+                self._print_warning("断点偏移超出文件大小（文件可能被截断），从文件末尾开始监控")
+                return 0
+            if unread > self.catch_up_max_bytes:
+                self._print_warning(f"停机期间写入 {unread:,} 字节，超过补读上限，从文件末尾开始监控")
+                return 0
+            
+            self.tailer.seek(offset)
+            entries = self.tailer.read_new_entries()
+        
+        earliest = time.time() - self.catch_up_window
+        caught_up = 0
+        for entry in entries:
+            log_time = parse_log_time(entry[0])
+            if log_time is not None and log_time < earliest:
+                continue
+            self._enqueue(entry)
+            caught_up += 1
+        
+        self._print_info(f"已从断点恢复，补处理停机期间的 {caught_up} 行（共 {len(entries)} 行）")
+        return caught_up
+    
+    def _check_event_stall(self):
+        """
+        事件丢失检测：文件持续增长但一直没有收到修改事件时，切换为轮询监控
+        :return: 是否已切换为轮询
+        """
+        if self.backend != "auto" or self.poller.active:
+            return False
+        
+        if self.tailer.unread_bytes() <= 0:
+            self._growth_seen_at = None
+            return False
+        
+        now = time.monotonic()
+        if self._growth_seen_at is None:
+            self._growth_seen_at = now
+            return False
+        
+        if now - self._growth_seen_at < self.stall_timeout:
+            return False
+        
+        self._print_warning(f"文件已增长但 {self.stall_timeout:g} 秒内未收到文件事件，切换为轮询监控")
+        self._growth_seen_at = None
+        self.poller.start()
+        # 立即补读事件丢失期间写入的内容
+        self.process_new_lines()
+        return True
+    
+    def _report_queue_status(self, min_interval=10):
+        """
+        队列出现丢弃时打印统计（限频）
+        :param min_interval: 两次打印之间的最短间隔（秒）
+        """
+        stats = self.work_queue.get_stats()
+        now = time.time()
+        if stats['dropped'] > self._last_reported_drops and now - self._last_queue_report >= min_interval:
+            self._print_warning(
+                f"处理队列积压：当前深度 {stats['depth']}/{stats['max_size']}，"
+                f"最高 {stats['max_depth']}，累计丢弃 {stats['dropped']} 行"
+                f"（其中命令 {stats['dropped_commands']} 行）"
+            )
+            self._last_reported_drops = stats['dropped']
+            self._last_queue_report = now
+    
+    def _report_duplicates(self, min_interval=10):
+        """
+        打印折叠的重复发言数（限频）
+        :param min_interval: 两次打印之间的最短间隔（秒）
+        """
+        if self.dedupe_filter is None:
+            return
+        stats = self.dedupe_filter.get_stats()
+        now = time.time()
+        if stats['dropped'] > self._last_reported_duplicates and now - self._last_dedupe_report >= min_interval:
+            self._print_info(
+                f"已折叠 {stats['dropped'] - self._last_reported_duplicates:,} 条重复发言"
+                f"（{stats['window']:g} 秒窗口，累计 {stats['dropped']:,} 条）"
+            )
+            self._last_reported_duplicates = stats['dropped']
+            self._last_dedupe_report = now
+    
     def on_modified(self, event):
         """文件修改事件处理"""
         if event.is_directory:
             return
         
         # 检查是否是我们要监控的文件
-        if os.path.abspath(event.src_path) == self.file_path:
-            current_modified_time = os.path.getmtime(self.file_path)
-            
-            # 避免重复触发（有时会触发多次修改事件）
-            if current_modified_time > self.last_modified_time:
-                self.last_modified_time = current_modified_time
-                
-                last_line = self.get_last_line()
-                self._print_content_change(last_line)
+        src_path = os.path.abspath(event.src_path)
+        if self.merge_streams and src_path in self.stream_tailers:
+            self.process_new_lines()
+        elif src_path == self.file_path:
+            # 偏移量保证重复的修改事件不会重复处理同一行
+            self.last_modified_time = os.path.getmtime(self.file_path) if os.path.exists(self.file_path) else 0
+            self.process_new_lines()
     
     def on_created(self, event):
         """文件创建事件处理"""
         if event.is_directory:
             return
         
-        if os.path.abspath(event.src_path) == self.file_path:
+        src_path = os.path.abspath(event.src_path)
+        self.log_index.add(src_path)
+        if src_path == self.file_path:
             self._print_success(f"文件已创建: {os.path.basename(self.file_path)}")
-            last_line = self.get_last_line()
-            self._print_content_change(last_line)
+            # 新建的文件从头读取，处理其中已写入的每一行
+            with self.tail_lock:
+                self.tailer.open(start_at_end=False)
+                self.process_new_lines()
+        elif is_user_speech_log(src_path) and self.log_index.is_newer(src_path, self.file_path):
+            # FlyAiLive 开始写新的发言记录文件：立即切换，不等待定期检查
+            self._print_success(f"检测到新的用户发言记录文件: {os.path.basename(src_path)}")
+            self._switch_to_file(src_path, start_at_end=False)
+        elif self.merge_streams and is_user_speech_log(src_path) and os.path.dirname(src_path) == self.file_dir:
+            # 较旧的文件也在写入（如另一个平台），一并合并读取
+            self._add_stream(src_path, start_at_end=False)
+    
+    def on_moved(self, event):
+        """文件移动/重命名事件处理"""
+        if event.is_directory:
+            return
+        
+        src_path = os.path.abspath(event.src_path)
+        dest_path = os.path.abspath(event.dest_path)
+        self.log_index.move(src_path, dest_path)
+        if src_path == self.file_path:
+            if is_user_speech_log(dest_path) and os.path.dirname(dest_path) == self.file_dir:
+                # 当前文件被重命名：已打开的句柄仍指向同一文件，只需更新路径
+                with self.tail_lock:
+                    self.process_new_lines()
+                    self.file_path = dest_path
+                    self.file_name = os.path.basename(dest_path)
+                    self.tailer.file_path = dest_path
+                self._print_info(f"文件已重命名: {os.path.basename(src_path)} -> {self.file_name}")
+            else:
+                self._handle_target_lost(f"文件被移走: {os.path.basename(src_path)}")
+        elif dest_path != self.file_path and self.log_index.is_newer(dest_path, self.file_path):
+            # 新文件以重命名方式出现（先写临时文件再改名）
+            self._print_success(f"检测到新的用户发言记录文件: {os.path.basename(dest_path)}")
+            self._switch_to_file(dest_path, start_at_end=False)
     
     def on_deleted(self, event):
         """文件删除事件处理"""
         if event.is_directory:
             return
         
-        if os.path.abspath(event.src_path) == self.file_path:
-            self._print_warning(f"文件被删除: {os.path.basename(self.file_path)}")
-            print("   🔍 正在查找新的用户发言记录文件...")
-            
-            # 重新查找最新文件
-            log_directory = os.path.dirname(self.file_path)
-            new_file = find_latest_user_speech_log(log_directory)
-            
-            if new_file and new_file != self.file_path:
-                old_file = self.file_path
-                # 更新监控目标
-                self.file_path = os.path.abspath(new_file)
-                self.file_name = os.path.basename(self.file_path)
-                self.last_modified_time = os.path.getmtime(self.file_path) if os.path.exists(self.file_path) else 0
-                
-                self._print_file_switch(old_file, new_file)
-                # 显示新文件的最后一行
-                last_line = self.get_last_line()
-                clean_content = self._extract_user_speech(last_line)
-                extracted_number = self._extract_number_with_kan(clean_content)
-                print(f"   📝 新文件原始内容: {last_line}")
-                print(f"   ✨ 新文件用户发言: {clean_content}")
-                if extracted_number is not None:
-                    print(f"   🔢 检测结果: 发现“看”字和数字 -> {extracted_number}")
-                else:
-                    print(f"   ❌ 检测结果: 未检测到“看”字和数字的组合")
-            else:
-                self._print_error("没有找到其他可监控的文件")
+        self.log_index.remove(event.src_path)
+        if self.merge_streams and os.path.abspath(event.src_path) in self.stream_tailers:
+            self._remove_stream(os.path.abspath(event.src_path))
+            self._release_merged()
+        elif os.path.abspath(event.src_path) == self.file_path:
+            self._handle_target_lost(f"文件被删除: {os.path.basename(self.file_path)}")
+    
+    def _handle_target_lost(self, message):
+        """
+        当前监控文件被删除或移走时，切换到目录中最新的发言记录文件
+        :param message: 警告信息
+        """
+        self._print_warning(message)
+        print("   🔍 正在查找新的用户发言记录文件...")
+        
+        # 重新查找最新文件
+        new_file = find_latest_user_speech_log(self.file_dir, self.log_index)
+        
+        if new_file and os.path.abspath(new_file) != self.file_path:
+            self._switch_to_file(new_file)
+        else:
+            # 仍然读完旧句柄中剩余的内容
+            self.process_new_lines()
+            self._print_error("没有找到其他可监控的文件")
     
     def check_for_newer_files(self):
-        """检查是否有更新的用户发言记录文件"""
+        """检查是否有更新的用户发言记录文件（事件丢失时的兜底检查）"""
         try:
-            log_directory = os.path.dirname(self.file_path)
-            newer_file = find_latest_user_speech_log(log_directory)
+            # 增量扫描：只对新出现的文件调用 stat
+            self.log_index.scan()
+            newer_file = self.log_index.latest()
             
             if newer_file and newer_file != self.file_path:
-                # 检查新文件的创建时间是否更新
-                current_create_time = os.path.getctime(self.file_path) if os.path.exists(self.file_path) else 0
-                new_create_time = os.path.getctime(newer_file)
-                
-                if new_create_time > current_create_time:
-                    old_file = self.file_path
-                    # 更新监控目标
-                    self.file_path = os.path.abspath(newer_file)
-                    self.file_name = os.path.basename(self.file_path)
-                    self.last_modified_time = os.path.getmtime(self.file_path)
-                    
+                # 检查新文件是否比当前文件更新
+                if self.log_index.is_newer(newer_file, self.file_path):
                     self._print_success("发现更新的文件")
-                    self._print_file_switch(old_file, newer_file)
-                    # 显示新文件的最后一行
-                    last_line = self.get_last_line()
-                    clean_content = self._extract_user_speech(last_line)
-                    extracted_number = self._extract_number_with_kan(clean_content)
-                    print(f"   📝 新文件原始内容: {last_line}")
-                    print(f"   ✨ 新文件用户发言: {clean_content}")
-                    if extracted_number is not None:
-                        print(f"   🔢 检测结果: 发现“看”字和数字 -> {extracted_number}")
-                    else:
-                        print(f"   ❌ 检测结果: 未检测到“看”字和数字的组合")
+                    self._switch_to_file(newer_file)
                     return True
         except Exception as e:
             self._print_error(f"检查新文件时出错: {str(e)}")
         
         return False
     
+    def start(self, observer):
+        """
+        启动处理线程并把自身注册到文件事件观察器（多个监控器可共享同一个观察器）
+        :param observer: watchdog 观察器
+        """
+        self.work_queue.start()
+        observer.schedule(self, self.file_dir, recursive=False)
+        if self.backend == "polling":
+            self.poller.start()
+        self._next_rotation_check = time.monotonic() + self.check_interval
+    
+    def tick(self):
+        """周期性维护：队列统计、事件丢失检测、断点保存和兜底检查新文件"""
+        self._report_queue_status()
+        self._report_duplicates()
+        self._check_event_stall()
+        if self.merge_streams:
+            if self.poller.active:
+                # 轮询只检查主文件，次要文件在这里补读
+                self.process_new_lines()
+            # 乱序窗口到期的行即使没有新行到达也要放行
+            self._release_merged()
+        self.save_checkpoint()
+        
+        # 兜底检查：事件丢失时仍能发现更新的文件
+        if time.monotonic() >= self._next_rotation_check:
+            self._print_info("定期检查是否有更新文件...")
+            if not self.check_for_newer_files():
+                print("   ✅ 当前文件仍是最新")
+            if self.merge_streams:
+                with self.tail_lock:
+                    self._prune_streams()
+                    self._discover_streams()
+            self._next_rotation_check = time.monotonic() + self.check_interval
+    
+    def stop(self):
+        """停止轮询和处理线程，保存断点并关闭文件"""
+        self.poller.stop()
+        if self.merge_streams:
+            self._release_merged(flush=True)
+        self.work_queue.stop()
+        self.save_checkpoint(force=True)
+        self.tailer.close()
+        for tailer in self.stream_tailers.values():
+            tailer.close()
+        
+        stats = self.work_queue.get_stats()
+        print(f"📊 处理队列统计{self._room_label()}: 已处理 {stats['processed']:,} 行，"
+              f"最高深度 {stats['max_depth']}，丢弃 {stats['dropped']:,} 行")
+        if self.decision_cache is not None:
+            cache_stats = self.decision_cache.get_stats()
+            print(f"📊 解析缓存统计{self._room_label()}: 命中率 {cache_stats['hit_rate']:.1%}"
+                  f"（命中 {cache_stats['hits']:,} / 未命中 {cache_stats['misses']:,}），"
+                  f"{cache_stats['size']}/{cache_stats['max_size']} 条，淘汰 {cache_stats['evictions']:,} 条")
+        if self.dedupe_filter is not None:
+            dedupe_stats = self.dedupe_filter.get_stats()
+            print(f"📊 重复发言过滤{self._room_label()}: 放行 {dedupe_stats['passed']:,} 行，"
+                  f"丢弃重复 {dedupe_stats['dropped']:,} 行")
+        if self.obs_manager:
+            switch_stats = self.obs_manager.get_switch_stats()
+            lock_stats = switch_stats["lock"]
+            print(f"📊 场景切换{self._room_label()}: 成功 {switch_stats['succeeded']:,} 次，失败 {switch_stats['failed']:,} 次；"
+                  f"切换锁平均持有 {lock_stats['avg_hold_us']:.1f} µs，最长 {lock_stats['max_hold_us']:.1f} µs")
+            pending_stats = switch_stats["pending"]
+            if pending_stats["queued"]:
+                print(f"📊 待切换队列{self._room_label()}: 冷却期间收到 {pending_stats['queued']:,} 条请求，"
+                      f"冷却结束后切换 {pending_stats['served']:,} 次，过期 {pending_stats['expired']:,} 个，"
+                      f"淘汰 {pending_stats['evicted']:,} 个")
+        if self.byte_prefilter:
+            print(f"📊 字节预过滤{self._room_label()}: 跳过 {self.rejected_lines:,} 行非命令发言（未解码）")
+    
+    def _room_label(self):
+        """多直播间模式下的直播间标识"""
+        return f" [{self.room_name}]" if self.room_name else ""
+    
     def start_monitoring(self):
         """开始监控文件"""
         observer = Observer()
-        observer.schedule(self, self.file_dir, recursive=False)
+        self.start(observer)
         observer.start()
         
         try:
@@ -341,40 +847,50 @@ class FileMonitor(FileSystemEventHandler):
             
             print("\n📈 监控参数:")
             print(f"   • 内容变化检测: 实时 ({self.content_check_interval}秒间隔)")
-            print(f"   • 新文件检测: 每 {self.check_interval//60} 分钟")
+            print(f"   • 监控方式: {self.backend}（轮询间隔 {self.poller.min_interval}~{self.poller.max_interval} 秒）")
+            print(f"   • 新文件检测: 实时事件 + 每 {self.check_interval} 秒兜底检查")
+            print(f"   • 处理队列: 最多 {self.work_queue.max_size} 行，溢出策略 {self.work_queue.policy}")
             print(f"   • 当前监控: {os.path.basename(self.file_path)}")
+            if self.merge_streams:
+                print(f"   • 多文件合并: 同时读取 {len(self.stream_tailers) + 1} 个活跃文件，乱序窗口 {self.merger.reorder_window:g} 秒")
             print("\n📝 功能说明:")
-            print("   • 监控文件内容变化")
+            print("   • 增量读取文件新增的每一行")
             print("   • 提取纯净用户发言内容")
             print("   • 检测'看'字和数字组合")
-            print("   • 监控文件删除并自动切换")
-            print("   • 定期检查更新文件")
+            print("   • 新文件创建/删除/重命名时立即切换")
+            print("   • 定期兜底检查更新文件")
             print("   • 统计切换次数并保存到数据库")
             print("\n⏹️ 按 Ctrl+C 停止监控")
             print("=" * 60)
             
-            check_counter = 0
             while True:
                 time.sleep(self.content_check_interval)
-                check_counter += 1
-                
-                # 每10分钟检查一次是否有更新的文件
-                if check_counter >= (self.check_interval / self.content_check_interval):
-                    self._print_info("定期检查是否有更新文件...")
-                    if not self.check_for_newer_files():
-                        print("   ✅ 当前文件仍是最新")
-                    check_counter = 0
+                self.tick()
                     
         except KeyboardInterrupt:
             print("\n\n⏹️ 停止文件监控...")
             observer.stop()
         
         observer.join()
+        self.stop()
+
+def load_monitor_settings(config_path="obs_config.json"):
+    """
+    读取配置文件中的监控参数（monitoring 节）
+    :param config_path: 配置文件路径
+    :return: 监控参数字典，读取失败时返回空字典
+    """
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            return json.load(f).get("monitoring", {}) or {}
+    except (OSError, ValueError, AttributeError):
+        return {}
 
-def find_latest_user_speech_log(log_directory):
+def find_latest_user_speech_log(log_directory, log_index=None):
     """
     查找指定目录中最新的含有'用户发言记录'的文件
     :param log_directory: 日志文件目录
+    :param log_index: 已有的文件索引，为None时扫描目录新建索引
     :return: 最新文件的完整路径，如果没有找到则返回None
     """
     try:
@@ -383,25 +899,24 @@ def find_latest_user_speech_log(log_directory):
             print(f"\n❌ 错误: 目录 {log_directory} 不存在")
             return None
         
-        # 搜索含有'用户发言记录'的文件
-        pattern = os.path.join(log_directory, "*用户发言记录*.txt")
-        matching_files = glob.glob(pattern)
+        if log_index is None:
+            log_index = SpeechLogIndex(log_directory)
         
-        if not matching_files:
+        # 根据文件名时间戳（或创建时间）获取最新的文件
+        latest_file = log_index.latest()
+        
+        if latest_file is None:
             print(f"\n⚠️ 在目录 {log_directory} 中没有找到含有'用户发言记录'的文件")
             return None
         
-        # 根据创建时间排序，获取最新的文件
-        latest_file = max(matching_files, key=os.path.getctime)
-        
-        # 获取文件信息
-        file_size = os.path.getsize(latest_file)
-        create_time = datetime.fromtimestamp(os.path.getctime(latest_file))
-        modify_time = datetime.fromtimestamp(os.path.getmtime(latest_file))
+        # 获取文件信息（使用索引中缓存的 stat 结果）
+        stat = log_index.get_stat(latest_file)
+        create_time = datetime.fromtimestamp(stat.st_ctime)
+        modify_time = datetime.fromtimestamp(stat.st_mtime)
         
         print(f"\n🔍 找到最新的用户发言记录文件:")
         print(f"   📁 【文件名 】: {os.path.basename(latest_file)}")
-        print(f"   💾 【文件大小】: {file_size:,} 字节")
+        print(f"   💾 【文件大小】: {stat.st_size:,} 字节")
         print(f"   🕰️ 【创建时间】: {create_time.strftime('%Y-%m-%d %H:%M:%S')}")
         print(f"   📝 【修改时间】: {modify_time.strftime('%Y-%m-%d %H:%M:%S')}")
         
@@ -475,6 +990,7 @@ def main():
     # 初始化OBS管理器
     print("\n🎥 初始化OBS管理器...")
     obs_manager = OBSManager()
+    compiled = obs_manager.compiled
     
     # 显示统计信息（如果有统计系统）
     if obs_manager.statistics:
@@ -498,6 +1014,8 @@ def main():
                     # 更新场景配置
                     obs_manager.update_scene_config()
                     obs_manager.print_scene_mapping()
+                    # 更新场景配置后重新编译了配置，文件监控器使用同一份
+                    compiled = obs_manager.compiled
                     print("✅ OBS功能已启用")
                 else:
                     print("⚠️ OBS连接失败，将禁用自动切换功能")
@@ -554,7 +1072,9 @@ def main():
     print("🔍 正在查找最新的'用户发言记录'文件...")
     
     # 查找最新的用户发言记录文件
-    file_to_monitor = find_latest_user_speech_log(log_directory)
+    monitor_settings = load_monitor_settings()
+    log_index = SpeechLogIndex(log_directory, order_by=monitor_settings.get("log_order", "name"))
+    file_to_monitor = find_latest_user_speech_log(log_directory, log_index)
     
     if file_to_monitor is None:
         print("\n❌ 无法找到适合的文件进行监控，程序退出")
@@ -563,7 +1083,11 @@ def main():
         return
     
     # 创建文件监控器（传入OBS管理器）
-    monitor = FileMonitor(file_to_monitor, obs_manager)
+    # 与OBS管理器共用同一份编译后的命令规则，不再重新读取配置文件
+    monitor = FileMonitor.from_settings(file_to_monitor, obs_manager, monitor_settings, log_index=log_index,
+                                        command_rules=compiled.command_rules if compiled else None)
+    # 从断点恢复上次的处理位置和切换状态
+    monitor.restore_checkpoint()
     
     # 显示当前文件的最后一行内容
     current_last_line = monitor.get_last_line()
@@ -580,10 +1104,21 @@ def main():
     else:
         print(f"   ❌ 检测结果: 未检测到“看”字和数字的组合")
     
+    # 配置文件热加载：修改 obs_config.json 后无需重启
+    config_watcher = None
+    if monitor_settings.get("watch_config", True):
+        config_watcher = ConfigWatcher("obs_config.json", compiled.raw if compiled else None)
+        if obs_manager:
+            config_watcher.add_listener(obs_manager.apply_config)
+        config_watcher.add_listener(monitor.apply_config)
+        config_watcher.start()
+    
     # 开始监控
     try:
         monitor.start_monitoring()
     finally:
+        if config_watcher:
+            config_watcher.stop()
         # 确保断开OBS连接
         if obs_manager:
             obs_manager.disconnect()
@@ -0,0 +1,147 @@
+"""
+多关键词匹配模块
+功能：
+1. 用 Aho-Corasick 自动机同时匹配所有关键词，一次线性扫描找出发言中的全部关键词
+2. 关键词来自每个场景的“场景名称”和可配置的 aliases（如“8米项链”、“多圈”）
+3. 匹配耗时只与发言长度有关，场景和商品增加到几百个也不会变慢
+4. 紧跟在数字或小数点之后的关键词不算匹配（“看14多圈”不会匹配到“4多圈”），这类发言交给数字规则
+"""
+
+from collections import deque
+
+
+class AhoCorasickMatcher:
+    """Aho-Corasick 多模式匹配自动机"""
+
+    def __init__(self, reject_after_number=False):
+        """
+        初始化空自动机（根节点为 0）
+        :param reject_after_number: 是否丢弃紧跟在数字或小数点之后的匹配（关键词只匹配到某个数字的一部分）
+        """
+        self._goto = [{}]      # 节点 -> {字符: 子节点}
+        self._fail = [0]       # 节点 -> 失配时跳转的节点
+        self._output = [[]]    # 节点 -> 在此结束的 (关键词长度, 值) 列表（含失配链上的）
+        self._built = True
+        self.reject_after_number = reject_after_number
+        self.keyword_count = 0
+
+    def add(self, keyword, value):
+        """
+        加入关键词（加入后需要重新 build）
+        :param keyword: 关键词
+        :param value: 匹配到时返回的值
+        """
+        if not keyword:
+            return
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            node = next_node
+        self._output[node].append((len(keyword), value))
+        self.keyword_count += 1
+        self._built = False
+
+    def build(self):
+        """按广度优先计算失配链接，并把失配链上的输出合并到每个节点"""
+        queue = deque(self._goto[0].values())
+        for child in queue:
+            self._fail[child] = 0
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[child] = target if target != child else 0
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+                queue.append(child)
+        self._built = True
+
+    def iter_matches(self, text):
+        """
+        一次扫描找出所有关键词
+        :param text: 要搜索的文本
+        :return: (起始位置, 结束位置, 值) 生成器
+        """
+        if not self._built:
+            self.build()
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        reject_after_number = self.reject_after_number
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for length, value in output[node]:
+                start = index + 1 - length
+                if reject_after_number and start > 0 and _is_number_char(text[start - 1]):
+                    continue
+                yield start, index + 1, value
+
+    def longest_match(self, text):
+        """
+        找出最长的关键词（长度相同时取最先出现的）
+        :param text: 要搜索的文本
+        :return: (起始位置, 结束位置, 值)，没有匹配时返回None
+        """
+        best = None
+        for match in self.iter_matches(text):
+            if best is None or match[1] - match[0] > best[1] - best[0]:
+                best = match
+        return best
+
+
+def _is_number_char(char):
+    """判断字符是否是数字的一部分（数字或小数点）"""
+    return char.isdigit() or char == "."
+
+
+def _is_number(text):
+    """判断文本是否是纯数字（这类场景名由数字规则处理）"""
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
+
+
+def build_scene_matcher(scenes, default_scene=None):
+    """
+    根据场景配置创建关键词匹配器
+    关键词为每个启用场景的“场景名称”和 aliases，值为该场景的切换命令；
+    纯数字的名称不作为关键词（否则“看108”会匹配到场景“10”）；
+    紧跟在数字或小数点之后的匹配不算（否则“看14多圈”会匹配到场景“4多圈”），交给数字规则；
+    默认场景不作为关键词（否则“看看默认的价格”也会切换场景并进入冷却）
+    :param scenes: scene_settings.scenes 配置
+    :param default_scene: 默认场景名称
+    :return: AhoCorasickMatcher 实例，没有关键词时返回None
+    """
+    matcher = AhoCorasickMatcher(reject_after_number=True)
+    for scene_info in (scenes or {}).values():
+        if not scene_info.get("enabled", True):
+            continue
+        if default_scene and scene_info.get("场景名称", scene_info.get("name")) == default_scene:
+            continue
+        command = str(scene_info.get("切换命令", scene_info.get("number", "")))
+        if not command:
+            continue
+        keywords = [scene_info.get("场景名称", scene_info.get("name"))]
+        keywords.extend(scene_info.get("aliases", []))
+        for keyword in keywords:
+            keyword = str(keyword or "").strip()
+            if keyword and not _is_number(keyword):
+                matcher.add(keyword, command)
+
+    if not matcher.keyword_count:
+        return None
+    matcher.build()
+    return matcher
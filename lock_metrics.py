@@ -0,0 +1,77 @@
+"""
+锁持有时间统计模块
+功能：
+1. TimedLock 可以直接替代 threading.Lock，用法相同（with 语句 / acquire / release）
+2. 记录每次加锁的等待时间和持有时间（纳秒计时，按微秒报告）
+3. 用于确认切换锁内只做内存状态更新，持有时间保持在微秒级
+"""
+
+import threading
+from time import perf_counter_ns
+
+
+class TimedLock:
+    """记录等待和持有时间的互斥锁"""
+
+    def __init__(self):
+        """初始化锁和统计"""
+        self._lock = threading.Lock()
+        self._acquired_at = 0
+        self.acquisitions = 0
+        self.total_hold_ns = 0
+        self.max_hold_ns = 0
+        self.total_wait_ns = 0
+        self.max_wait_ns = 0
+
+    def acquire(self, blocking=True, timeout=-1):
+        """
+        加锁
+        :param blocking: 是否阻塞等待
+        :param timeout: 最长等待秒数，-1 表示一直等待
+        :return: 是否加锁成功
+        """
+        start = perf_counter_ns()
+        acquired = self._lock.acquire(blocking, timeout)
+        if acquired:
+            # 统计只在持有锁时更新，不需要额外的锁
+            now = perf_counter_ns()
+            wait = now - start
+            self._acquired_at = now
+            self.acquisitions += 1
+            self.total_wait_ns += wait
+            if wait > self.max_wait_ns:
+                self.max_wait_ns = wait
+        return acquired
+
+    def release(self):
+        """解锁"""
+        held = perf_counter_ns() - self._acquired_at
+        self.total_hold_ns += held
+        if held > self.max_hold_ns:
+            self.max_hold_ns = held
+        self._lock.release()
+
+    def locked(self):
+        """是否已被持有"""
+        return self._lock.locked()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+    def get_stats(self):
+        """
+        获取锁统计（微秒）
+        :return: 统计字典
+        """
+        count = self.acquisitions
+        return {
+            'acquisitions': count,
+            'avg_hold_us': self.total_hold_ns / count / 1000 if count else 0.0,
+            'max_hold_us': self.max_hold_ns / 1000,
+            'avg_wait_us': self.total_wait_ns / count / 1000 if count else 0.0,
+            'max_wait_us': self.max_wait_ns / 1000
+        }
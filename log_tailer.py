@@ -0,0 +1,446 @@
+"""
+增量日志读取模块
+功能：
+1. 保持文件句柄打开，记录已读取的字节偏移
+2. 每次只读取新追加的字节，按完整行返回
+3. 检测文件被截断（大小变小）和被替换（同名新文件）
+4. 从文件末尾反向分块查找最后一行，耗时与文件大小无关
+5. 每个文件只检测一次编码（BOM + 采样），用增量解码器解码新内容；
+   采样只有 ASCII 时（如第一次只写入了时间戳或系统消息）暂不确定，之后继续采样直到出现非 ASCII 字节
+6. 可选的字节级预过滤：不可能是命令的行不解码，只计数
+"""
+
+import codecs
+import os
+import time
+
+# BOM -> (编码, BOM长度)
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8', 3),
+    (codecs.BOM_UTF16_LE, 'utf-16-le', 2),
+    (codecs.BOM_UTF16_BE, 'utf-16-be', 2),
+)
+
+DEFAULT_ENCODING = 'utf-8'
+
+# 编码检测的最大采样字节数
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+
+def detect_encoding(sample):
+    """
+    根据 BOM 和采样字节检测文本编码
+    :param sample: 文件开头的字节
+    :return: (编码名称, BOM长度)；采样为空时返回None
+    """
+    if not sample:
+        return None
+
+    for bom, encoding, length in _BOMS:
+        if sample.startswith(bom):
+            return encoding, length
+
+    # 无 BOM 的 UTF-16：ASCII 字符（时间戳、数字、换行）的高字节为 0
+    half = max(1, len(sample) // 2)
+    even_zeros = sample[0::2].count(0)
+    odd_zeros = sample[1::2].count(0)
+    if odd_zeros > half * 0.3 and even_zeros < half * 0.05:
+        return 'utf-16-le', 0
+    if even_zeros > half * 0.3 and odd_zeros < half * 0.05:
+        return 'utf-16-be', 0
+
+    # 采样末尾可能截断了一个多字节字符，使用增量解码器并忽略末尾残缺
+    for encoding in ('utf-8', 'gb18030'):
+        try:
+            codecs.getincrementaldecoder(encoding)().decode(sample, final=False)
+            return encoding, 0
+        except UnicodeDecodeError:
+            continue
+
+    return DEFAULT_ENCODING, 0
+
+
+def detect_file_encoding(file_path, sample_size=ENCODING_SAMPLE_SIZE):
+    """
+    读取文件开头的采样字节检测编码
+    :param file_path: 文件路径
+    :param sample_size: 采样字节数
+    :return: (编码名称, BOM长度)；文件为空或无法读取时返回None
+    """
+    try:
+        with open(file_path, 'rb') as file:
+            return detect_encoding(file.read(sample_size))
+    except OSError:
+        return None
+
+
+def _find_last_newline(buffer, newline, base=0, end=None):
+    """
+    查找最后一个换行符的位置（UTF-16 时要求与字符边界对齐）
+    :param buffer: 字节缓冲区
+    :param newline: 换行符的编码字节
+    :param base: 缓冲区起点相对字符边界的偏移
+    :param end: 查找范围的结束位置
+    :return: 换行符起始位置，找不到时返回-1
+    """
+    unit = len(newline)
+    end = len(buffer) if end is None else end
+    while True:
+        index = buffer.rfind(newline, 0, end)
+        if index < 0 or (base + index) % unit == 0:
+            return index
+        end = index + unit - 1
+
+
+def _split_lines(block, newline):
+    """
+    按换行符切分字节块（UTF-16 时跳过未对齐的匹配）
+    :param block: 只包含完整行的字节块（起点与字符边界对齐）
+    :param newline: 换行符的编码字节
+    :return: 行（bytes）列表
+    """
+    if len(newline) == 1:
+        return block.split(newline)
+
+    lines = []
+    start = 0
+    search = 0
+    while True:
+        index = block.find(newline, search)
+        if index < 0:
+            lines.append(block[start:])
+            return lines
+        if (index - start) % len(newline):
+            search = index + 1
+            continue
+        lines.append(block[start:index])
+        start = search = index + len(newline)
+
+
+def read_last_line(file_path, encoding=None, block_size=4096):
+    """
+    从文件末尾反向分块读取最后一行
+    只拼接字节、找到完整行后再解码，因此块边界切断的多字节字符不会被破坏
+    :param file_path: 文件路径
+    :param encoding: 文件编码，为None时自动检测
+    :param block_size: 每次向前读取的字节数
+    :return: 去除首尾空白的最后一行；文件为空时返回None
+    """
+    detected = detect_file_encoding(file_path)
+    if detected is None:
+        # 区分文件不存在和文件为空
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(file_path)
+        return None
+    bom_length = detected[1]
+    encoding = encoding or detected[0]
+    newline = '\n'.encode(encoding)
+
+    with open(file_path, 'rb') as file:
+        end = file.seek(0, os.SEEK_END)
+        if end <= bom_length:
+            return None
+
+        # 忽略文件末尾的一个换行符（与 readlines()[-1] 的行为一致）
+        file.seek(end - len(newline))
+        if file.read(len(newline)) == newline:
+            end -= len(newline)
+
+        data = b''
+        position = end
+        while position > bom_length:
+            read_size = min(block_size, position - bom_length)
+            position -= read_size
+            file.seek(position)
+            data = file.read(read_size) + data
+
+            # 换行符可能跨越块边界，多搜索 len(newline)-1 个字节
+            limit = min(len(data), read_size + len(newline) - 1)
+            index = _find_last_newline(data, newline, base=position - bom_length, end=limit)
+            if index >= 0:
+                data = data[index + len(newline):]
+                break
+
+    return data.decode(encoding, errors='replace').strip()
+
+
+class LogTailer:
+    """增量日志读取器（tail -f 风格）"""
+
+    def __init__(self, file_path, encoding=None, start_at_end=True, chunk_size=64 * 1024, line_filter=None):
+        """
+        初始化增量读取器
+        :param file_path: 要读取的文件路径
+        :param encoding: 文件编码，为None时按文件自动检测
+        :param start_at_end: True 表示从文件末尾开始（只读取之后追加的内容）
+        :param chunk_size: 每次读取的字节数
+        :param line_filter: 字节级预过滤工厂：函数 (编码) -> 函数 (原始行 bytes) -> bool 或None；
+                            预过滤返回 False 的行不解码、不返回，只计入 rejected_lines；
+                            编码确定之前（采样只有 ASCII）不使用预过滤
+        """
+        self.file_path = os.path.abspath(file_path)
+        self.forced_encoding = encoding
+        self.encoding = encoding
+        self.chunk_size = chunk_size
+        self.offset = 0          # 已读取的字节偏移
+        self._file = None
+        self._identity = None    # (st_dev, st_ino)，用于识别文件是否被替换
+        self._pending = b''      # 尚未以换行结尾的残余字节
+        self._bom_length = 0
+        self._newline = None     # 当前编码下换行符的字节
+        self._decoder = None     # 当前文件的增量解码器
+        self._encoding_confirmed = False  # 编码是否已确定（只有 ASCII 的采样不算）
+        self.line_filter = line_filter
+        self.rejected_lines = 0  # 被预过滤跳过的行数
+
+        self.open(start_at_end)
+
+    def open(self, start_at_end=True):
+        """
+        打开文件并定位读取位置
+        :param start_at_end: 是否从文件末尾开始
+        :return: 是否成功打开
+        """
+        self.close()
+        try:
+            self._file = open(self.file_path, 'rb')
+        except OSError:
+            self._file = None
+            self._identity = None
+            self.offset = 0
+            return False
+
+        stat = os.fstat(self._file.fileno())
+        self._identity = (stat.st_dev, stat.st_ino)
+        self.offset = stat.st_size if start_at_end else 0
+        self._pending = b''
+        self._reset_codec()
+        self._ensure_codec()
+        return True
+
+    def close(self):
+        """关闭文件句柄"""
+        if self._file:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+        self._file = None
+
+    def _print_info(self, message):
+        """打印信息消息"""
+        timestamp = time.strftime('%H:%M:%S')
+        print(f"\n🗓️ [{timestamp}] {message}")
+
+    def _reset_codec(self):
+        """清除编码检测结果（文件被替换或截断后重新检测）"""
+        self.encoding = self.forced_encoding
+        self._bom_length = 0
+        self._newline = None
+        self._decoder = None
+        self._encoding_confirmed = False
+
+    @property
+    def encoding_confirmed(self):
+        """编码是否已确定（指定了编码、有 BOM、采样中出现非 ASCII 字节或采样已达上限）"""
+        return self._encoding_confirmed
+
+    def _ensure_codec(self):
+        """
+        每个文件只检测一次编码；空文件推迟到有内容时再检测
+        :return: 是否已有可用的编码（可能尚未确定）
+        """
+        if self._newline is not None:
+            return True
+        return self._detect_codec()
+
+    def _detect_codec(self):
+        """
+        采样文件开头检测编码
+        只有 ASCII 的采样在 UTF-8 和 GBK 下解码结果相同，先按检测结果读取，但不视为已确定；
+        ASCII 内容与编码无关，之后确定编码时直接换用新的解码器
+        :return: 是否已有可用的编码
+        """
+        if not self._file:
+            return False
+
+        self._file.seek(0)
+        sample = self._file.read(ENCODING_SAMPLE_SIZE)
+        detected = detect_encoding(sample)
+        if detected is None:
+            return False
+
+        encoding, self._bom_length = detected
+        confirmed = (bool(self.forced_encoding) or self._bom_length > 0 or encoding.startswith('utf-16')
+                     or not sample.isascii() or len(sample) >= ENCODING_SAMPLE_SIZE)
+        if self.forced_encoding:
+            encoding = self.forced_encoding
+        if encoding != self.encoding or self._decoder is None:
+            self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self.encoding = encoding
+        self._newline = '\n'.encode(encoding)
+        self._encoding_confirmed = confirmed
+        if self.offset < self._bom_length:
+            self.offset = self._bom_length
+        return True
+
+    def _check_rotation(self):
+        """
+        检查文件是否被截断或替换
+        :return: 'truncated'、'replaced' 或 None
+        """
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            # 文件已被删除：继续使用已打开的句柄读完剩余内容
+            return None
+
+        if (stat.st_dev, stat.st_ino) != self._identity:
+            return 'replaced'
+        if stat.st_size < self.offset:
+            return 'truncated'
+        return None
+
+    def _drain(self):
+        """
+        从当前偏移读取到文件末尾
+        :return: (换行符, 解码器, 完整行字节块, 块起始偏移, 文件标识, 编码, 编码是否已确定)，
+                 没有新的完整行时返回None
+        """
+        if not self._file or not self._ensure_codec():
+            return None
+
+        self._file.seek(self.offset)
+        chunks = []
+        while True:
+            data = self._file.read(self.chunk_size)
+            if not data:
+                break
+            chunks.append(data)
+            self.offset += len(data)
+
+        if not chunks:
+            return None
+        if not self._encoding_confirmed:
+            # 编码尚未确定：重新采样（包含刚读到的内容），出现非 ASCII 字节时确定编码
+            self._detect_codec()
+
+        buffer = self._pending + b''.join(chunks)
+        base = self.offset - len(buffer) - self._bom_length
+        last_newline = _find_last_newline(buffer, self._newline, base=base)
+        if last_newline < 0:
+            self._pending = buffer
+            return None
+
+        self._pending = buffer[last_newline + len(self._newline):]
+        block_start = self.offset - len(buffer)
+        return (self._newline, self._decoder, buffer[:last_newline], block_start, self._identity,
+                self.encoding, self._encoding_confirmed)
+
+    def _read_segments(self):
+        """
+        读取自上次调用以来新追加的内容
+        文件被替换时旧文件和新文件的内容分属不同段（编码可能不同）
+        :return: (换行符, 解码器, 完整行字节块, 块起始偏移, 文件标识, 编码, 编码是否已确定) 列表
+        """
+        if not self._file:
+            # 文件之前不存在，尝试从头打开
+            if not self.open(start_at_end=False):
+                return []
+
+        segments = [self._drain()]
+
+        status = self._check_rotation()
+        if status == 'truncated':
+            self._print_info(f"文件被截断，从头重新读取: {os.path.basename(self.file_path)}")
+            self.offset = 0
+            self._pending = b''
+            self._reset_codec()
+            segments.append(self._drain())
+        elif status == 'replaced':
+            self._print_info(f"文件已被替换，重新打开: {os.path.basename(self.file_path)}")
+            # 旧文件已写完，残余内容视为最后一行
+            if self._pending and self._newline is not None:
+                pending_start = self.offset - len(self._pending)
+                segments.append((self._newline, self._decoder, self._pending, pending_start,
+                                 self._identity, self.encoding, self._encoding_confirmed))
+            if self.open(start_at_end=False):
+                segments.append(self._drain())
+
+        return [segment for segment in segments if segment]
+
+    @property
+    def identity(self):
+        """当前文件标识 (st_dev, st_ino)"""
+        return self._identity
+
+    @property
+    def committed_offset(self):
+        """最后一个完整行之后的字节偏移（不含未以换行结尾的残余字节）"""
+        return self.offset - len(self._pending)
+
+    def seek(self, offset):
+        """
+        从指定偏移继续读取（用于从断点恢复）
+        :param offset: 字节偏移，必须位于行首
+        """
+        self.offset = max(offset, self._bom_length)
+        self._pending = b''
+
+    def unread_bytes(self):
+        """
+        获取文件中尚未读取的字节数（用于检测事件是否丢失）
+        :return: 未读取的字节数
+        """
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return 0
+        if (stat.st_dev, stat.st_ino) != self._identity:
+            return stat.st_size
+        return max(0, stat.st_size - self.offset)
+
+    def read_new_raw_lines(self):
+        """
+        读取自上次调用以来新追加的所有完整行（不解码）
+        :return: 完整行（bytes）列表
+        """
+        lines = []
+        for newline, _, block, _, _, _, _ in self._read_segments():
+            lines.extend(_split_lines(block, newline))
+        return lines
+
+    def read_new_lines(self):
+        """
+        读取新追加的所有完整行并解码
+        每段只调用一次增量解码器，多字节字符不会被读取边界破坏
+        :return: 非空文本行列表
+        """
+        return [entry[0] for entry in self.read_new_entries()]
+
+    def read_new_entries(self):
+        """
+        读取新追加的所有完整行，并给出来源文件和每行结束处的字节偏移（用于显示和断点保存）
+        :return: (文本行, 文件路径, 文件标识, 行结束偏移) 列表，空行被跳过
+        """
+        entries = []
+        for newline, decoder, block, position, identity, encoding, confirmed in self._read_segments():
+            raw_lines = _split_lines(block, newline)
+            # 编码确定之前不做字节预过滤，否则按错误编码的触发词字节查找会丢掉所有命令
+            accept = self.line_filter(encoding) if self.line_filter and confirmed else None
+            if accept is None:
+                # 换行符按字符边界切分，解码后的行与原始字节行一一对应
+                text_lines = decoder.decode(block).split('\n')
+            else:
+                # 只解码通过预过滤的行（每行都是完整字符，可以单独解码）
+                text_lines = [raw.decode(encoding, errors='replace') if accept(raw) else None
+                              for raw in raw_lines]
+            for raw, text in zip(raw_lines, text_lines):
+                position += len(raw) + len(newline)
+                if text is None:
+                    self.rejected_lines += 1
+                    continue
+                text = text.strip()
+                if text:
+                    entries.append((text, self.file_path, identity, position))
+        return entries
@@ -0,0 +1,267 @@
+"""
+多直播间监控模块
+功能：
+1. 一个进程同时监控多个直播间的日志目录
+2. 所有直播间共享一个文件事件观察器，事件按目录分发给各自的 FileMonitor / OBSManager
+3. 相同的配置文件只加载和编译一次，相同的统计数据库只创建一个统计管理器
+"""
+
+import json
+import os
+import sys
+import time
+from watchdog.observers import Observer
+from obs_manager import OBSManager
+from fileMonitor import FileMonitor, find_latest_user_speech_log
+from speech_log_index import SpeechLogIndex
+from command_rules import CommandRules
+from compiled_config import ConfigWatcher, compile_config
+
+try:
+    from switch_statistics import SwitchStatistics
+except ImportError:
+    print("⚠️ 统计模块导入失败，将禁用统计功能")
+    SwitchStatistics = None
+
+
+def load_rooms(rooms_config_path):
+    """
+    读取直播间列表
+    :param rooms_config_path: 直播间配置文件路径
+    :return: 直播间配置列表
+    """
+    try:
+        with open(rooms_config_path, 'r', encoding='utf-8') as f:
+            rooms = json.load(f).get("rooms", [])
+    except FileNotFoundError:
+        print(f"❌ 直播间配置文件不存在: {rooms_config_path}")
+        return []
+    except (OSError, ValueError) as e:
+        print(f"❌ 直播间配置文件格式错误: {e}")
+        return []
+
+    valid_rooms = []
+    for index, room in enumerate(rooms, 1):
+        if not room.get("log_directory"):
+            print(f"⚠️ 第 {index} 个直播间缺少 log_directory，已跳过")
+            continue
+        room.setdefault("name", f"直播间{index}")
+        room.setdefault("config_path", "obs_config.json")
+        valid_rooms.append(room)
+    return valid_rooms
+
+
+def room_checkpoint_file(room, shared_monitoring=None):
+    """
+    获取直播间的断点文件路径
+    直播间自己没有指定时，在配置文件 monitoring.checkpoint_file 的文件名后加上直播间名称，
+    共用同一配置文件的直播间不会写入同一个断点文件，重启时也不会恢复其他直播间的切换状态
+    :param room: 直播间配置
+    :param shared_monitoring: 配置文件的 monitoring 节
+    :return: 断点文件路径
+    """
+    checkpoint_file = room.get("checkpoint_file") or (room.get("monitoring") or {}).get("checkpoint_file")
+    if checkpoint_file:
+        return checkpoint_file
+    shared = (shared_monitoring or {}).get("checkpoint_file") or "monitor_checkpoint.json"
+    root, ext = os.path.splitext(shared)
+    return f"{root}_{room['name']}{ext or '.json'}"
+
+
+class MultiRoomMonitor:
+    """多直播间监控器"""
+
+    def __init__(self, rooms_config_path="rooms_config.json"):
+        """
+        初始化多直播间监控器
+        :param rooms_config_path: 直播间配置文件路径
+        """
+        self.rooms_config_path = rooms_config_path
+        self.rooms = load_rooms(rooms_config_path)
+        self.monitors = []
+        self.obs_managers = []
+        self._configs = {}      # 配置文件绝对路径 -> 已加载的配置（同一文件只加载一次）
+        self._compiled = {}     # 配置文件绝对路径 -> 编译后的配置（同一文件只编译一次）
+        self._statistics = {}   # 数据库绝对路径 -> 统计管理器
+        self._watchers = {}     # 配置文件绝对路径 -> 配置监视器（同一文件只监视一次）
+        self.content_check_interval = 0.5
+
+    def _shared_config(self, config_path):
+        """
+        获取共享的配置（同一配置文件只加载一次）
+        :param config_path: 配置文件路径
+        :return: 配置字典，加载失败时返回None
+        """
+        key = os.path.abspath(config_path)
+        if key not in self._configs:
+            try:
+                with open(key, 'r', encoding='utf-8') as f:
+                    self._configs[key] = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"❌ 加载配置文件失败 {config_path}: {e}")
+                self._configs[key] = None
+        return self._configs[key]
+
+    def _shared_compiled(self, config_path):
+        """
+        获取共享的编译后配置（同一配置文件只编译一次，所有直播间使用同一份场景查找表和命令规则）
+        :param config_path: 配置文件路径
+        :return: CompiledConfig 实例，加载失败时返回None
+        """
+        key = os.path.abspath(config_path)
+        if key not in self._compiled:
+            self._compiled[key] = compile_config(self._shared_config(config_path))
+        return self._compiled[key]
+
+    def _config_watcher(self, config_path):
+        """
+        获取配置文件的监视器（同一配置文件只创建一个）
+        :param config_path: 配置文件路径
+        :return: ConfigWatcher 实例
+        """
+        key = os.path.abspath(config_path)
+        if key not in self._watchers:
+            self._watchers[key] = ConfigWatcher(key, self._shared_config(config_path))
+        return self._watchers[key]
+
+    def _shared_statistics(self, db_path):
+        """
+        获取共享的统计管理器（同一数据库只创建一个）
+        :param db_path: 数据库文件路径
+        :return: 统计管理器实例，统计模块不可用时返回None
+        """
+        if not SwitchStatistics:
+            return None
+        key = os.path.abspath(db_path)
+        if key not in self._statistics:
+            try:
+                self._statistics[key] = SwitchStatistics(db_path)
+            except Exception as e:
+                print(f"⚠️ 统计系统初始化失败: {e}")
+                self._statistics[key] = None
+        return self._statistics[key]
+
+    def _setup_room(self, room):
+        """
+        初始化单个直播间的 OBS 管理器和文件监控器
+        :param room: 直播间配置
+        :return: FileMonitor 实例，失败时返回None
+        """
+        name = room["name"]
+        print(f"\n🏠 初始化直播间: {name}")
+
+        compiled = self._shared_compiled(room["config_path"])
+        obs_manager = None
+        if room.get("obs_enabled", True) and compiled:
+            obs_manager = OBSManager(
+                room["config_path"],
+                statistics=self._shared_statistics(room.get("stats_db", "switch_records.db")),
+                compiled=compiled
+            )
+            if obs_manager.connect():
+                if room.get("update_scene_config", False):
+                    obs_manager.update_scene_config()
+                obs_manager.print_scene_mapping()
+                self.obs_managers.append(obs_manager)
+            else:
+                print(f"⚠️ [{name}] OBS连接失败，该直播间将禁用自动切换功能")
+                obs_manager = None
+
+        # 直播间自己的 monitoring 参数覆盖配置文件中的参数
+        config = self._shared_config(room["config_path"]) or {}
+        settings = dict(config.get("monitoring") or {})
+        settings.update(room.get("monitoring", {}))
+        settings["checkpoint_file"] = room_checkpoint_file(room, config.get("monitoring"))
+
+        log_directory = room["log_directory"]
+        log_index = SpeechLogIndex(log_directory, order_by=settings.get("log_order", "name"))
+        file_to_monitor = find_latest_user_speech_log(log_directory, log_index)
+        if file_to_monitor is None:
+            print(f"❌ [{name}] 无法找到适合的文件进行监控，已跳过")
+            if obs_manager:
+                obs_manager.disconnect()
+            return None
+
+        # 文件监控器与 OBS 管理器使用同一份命令规则（update_scene_config 之后以 OBS 管理器的为准）
+        if obs_manager:
+            compiled = obs_manager.compiled
+        monitor = FileMonitor.from_settings(
+            file_to_monitor,
+            obs_manager,
+            settings,
+            log_index=log_index,
+            room_name=name,
+            command_rules=compiled.command_rules if compiled else CommandRules()
+        )
+        monitor.restore_checkpoint()
+
+        # 配置文件热加载：同一配置文件的所有直播间一起更新
+        if settings.get("watch_config", True):
+            watcher = self._config_watcher(room["config_path"])
+            if obs_manager:
+                watcher.add_listener(obs_manager.apply_config)
+            watcher.add_listener(monitor.apply_config)
+        return monitor
+
+    def run(self):
+        """初始化所有直播间并开始监控，直到按 Ctrl+C"""
+        if not self.rooms:
+            print("❌ 没有可监控的直播间")
+            return
+
+        for room in self.rooms:
+            monitor = self._setup_room(room)
+            if monitor:
+                self.monitors.append(monitor)
+
+        if not self.monitors:
+            print("\n❌ 没有成功初始化的直播间，程序退出")
+            return
+
+        # 所有直播间共享一个观察器线程
+        observer = Observer()
+        for monitor in self.monitors:
+            monitor.start(observer)
+        observer.start()
+        for watcher in self._watchers.values():
+            watcher.start()
+
+        print("\n" + "=" * 60)
+        print(f"🚀 多直播间监控已启动，共 {len(self.monitors)} 个直播间")
+        for monitor in self.monitors:
+            obs_status = "OBS已连接" if monitor.obs_manager else "仅监控"
+            print(f"   🏠 {monitor.room_name}: {os.path.basename(monitor.file_path)}（{obs_status}）")
+        print("\n⏹️ 按 Ctrl+C 停止监控")
+        print("=" * 60)
+
+        try:
+            while True:
+                time.sleep(self.content_check_interval)
+                for monitor in self.monitors:
+                    monitor.tick()
+        except KeyboardInterrupt:
+            print("\n\n⏹️ 停止多直播间监控...")
+        finally:
+            for watcher in self._watchers.values():
+                watcher.stop()
+            observer.stop()
+            observer.join()
+            for monitor in self.monitors:
+                monitor.stop()
+            for obs_manager in self.obs_managers:
+                obs_manager.disconnect()
+
+
+def main():
+    """多直播间模式入口"""
+    rooms_config_path = sys.argv[1] if len(sys.argv) > 1 else "rooms_config.json"
+
+    print("🚀 " + "=" * 50)
+    print("📄 文件监控程序 - 多直播间模式")
+    print("=" * 54)
+
+    MultiRoomMonitor(rooms_config_path).run()
+
+
+if __name__ == "__main__":
+    main()
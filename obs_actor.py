@@ -0,0 +1,205 @@
+"""
+OBS 请求执行模块
+功能：
+1. 一个 I/O 线程独占 OBS WebSocket 连接，所有请求都排队交给它执行，不再由多个线程同时使用同一个客户端
+2. 请求按优先级排队：场景切换优先于源信息轮询，切换最多等待一个正在执行的请求
+3. 统计每种请求的排队时间和执行耗时
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+
+# 请求优先级（数字越小越先执行）
+PRIORITY_SWITCH = 0      # 场景切换
+PRIORITY_NORMAL = 5      # 连接检查、场景列表等一般请求
+PRIORITY_INVENTORY = 10  # 源信息轮询
+
+
+class _RequestStats:
+    """单个请求类型的统计"""
+
+    __slots__ = ("count", "errors", "total_wait", "max_wait", "total_latency", "max_latency")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def add(self, wait, latency, failed):
+        """记录一次请求"""
+        self.count += 1
+        if failed:
+            self.errors += 1
+        self.total_wait += wait
+        self.total_latency += latency
+        if wait > self.max_wait:
+            self.max_wait = wait
+        if latency > self.max_latency:
+            self.max_latency = latency
+
+
+class OBSRequestActor:
+    """独占 OBS 客户端的请求执行线程"""
+
+    def __init__(self, client, name="obs-io"):
+        """
+        初始化并启动 I/O 线程
+        :param client: obsws_python.ReqClient 实例（之后只在 I/O 线程中使用）
+        :param name: 线程名称
+        """
+        self.client = client
+        self._queue = []   # (优先级, 序号, 方法名, 位置参数, 关键字参数, Future, 入队时间)
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._running = True
+        self._stats = {}   # 方法名 -> _RequestStats
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, method, *args, priority=PRIORITY_NORMAL, **kwargs):
+        """
+        提交一个请求
+        :param method: 客户端方法名（如 "set_current_program_scene"）
+        :param priority: 优先级，数字越小越先执行
+        :return: Future，结果为客户端方法的返回值
+        """
+        future = Future()
+        with self._condition:
+            if not self._running:
+                future.set_exception(RuntimeError("OBS 请求线程已停止"))
+                return future
+            heapq.heappush(self._queue, (priority, next(self._sequence), method, args, kwargs,
+                                         future, time.perf_counter()))
+            self._condition.notify()
+        return future
+
+    def call(self, method, *args, priority=PRIORITY_NORMAL, timeout=None, **kwargs):
+        """
+        提交请求并等待结果
+        :param method: 客户端方法名
+        :param priority: 优先级
+        :param timeout: 最长等待秒数，为None时一直等待
+        :return: 客户端方法的返回值（出错时抛出原异常）
+        """
+        if threading.current_thread() is self._thread:
+            # 在 I/O 线程的回调中再发请求：直接执行，避免等待自己
+            return getattr(self.client, method)(*args, **kwargs)
+        return self.submit(method, *args, priority=priority, **kwargs).result(timeout)
+
+    def client_proxy(self, priority=PRIORITY_NORMAL):
+        """
+        获取按指定优先级排队的客户端代理，接口与 ReqClient 相同（供 SourceManager 等使用）
+        :param priority: 通过代理发出的请求的优先级
+        :return: ClientProxy 实例
+        """
+        return ClientProxy(self, priority)
+
+    def queue_depth(self):
+        """等待执行的请求数"""
+        with self._condition:
+            return len(self._queue)
+
+    def stop(self, drain=True):
+        """
+        停止 I/O 线程
+        :param drain: 是否先执行完已排队的请求，否则取消它们
+        """
+        with self._condition:
+            self._running = False
+            if not drain:
+                for item in self._queue:
+                    item[5].cancel()
+                self._queue.clear()
+            self._condition.notify()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        """I/O 线程主循环"""
+        while True:
+            with self._condition:
+                while self._running and not self._queue:
+                    self._condition.wait()
+                if not self._queue:
+                    return
+                _, _, method, args, kwargs, future, enqueued_at = heapq.heappop(self._queue)
+
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.perf_counter()
+            failed = False
+            try:
+                result = getattr(self.client, method)(*args, **kwargs)
+            except Exception as e:
+                failed = True
+                error = e
+            finished = time.perf_counter()
+
+            stats = self._stats.get(method)
+            if stats is None:
+                stats = self._stats[method] = _RequestStats()
+            stats.add(started - enqueued_at, finished - started, failed)
+
+            # 回调在 I/O 线程中执行，保持简短
+            if failed:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def get_stats(self):
+        """
+        获取每种请求的统计（毫秒）
+        :return: 方法名 -> 统计字典
+        """
+        report = {}
+        for method, stats in list(self._stats.items()):
+            count = stats.count
+            report[method] = {
+                'count': count,
+                'errors': stats.errors,
+                'avg_wait_ms': stats.total_wait / count * 1000 if count else 0.0,
+                'max_wait_ms': stats.max_wait * 1000,
+                'avg_latency_ms': stats.total_latency / count * 1000 if count else 0.0,
+                'max_latency_ms': stats.max_latency * 1000
+            }
+        return report
+
+    def print_stats(self, label=""):
+        """打印请求统计"""
+        report = self.get_stats()
+        if not report:
+            return
+        print(f"📊 OBS请求统计{label}:")
+        for method, stats in sorted(report.items(), key=lambda item: -item[1]['count']):
+            print(f"   • {method}: {stats['count']:,} 次（失败 {stats['errors']}），"
+                  f"排队 平均 {stats['avg_wait_ms']:.1f} / 最长 {stats['max_wait_ms']:.1f} ms，"
+                  f"执行 平均 {stats['avg_latency_ms']:.1f} / 最长 {stats['max_latency_ms']:.1f} ms")
+
+
+class ClientProxy:
+    """把客户端方法调用转为 I/O 线程中按优先级排队的请求"""
+
+    def __init__(self, actor, priority):
+        """
+        初始化代理
+        :param actor: OBSRequestActor 实例
+        :param priority: 请求优先级
+        """
+        self._actor = actor
+        self._priority = priority
+
+    def __getattr__(self, method):
+        if method.startswith("_"):
+            raise AttributeError(method)
+
+        def request(*args, **kwargs):
+            return self._actor.call(method, *args, priority=self._priority, **kwargs)
+
+        request.__name__ = method
+        return request
@@ -1,7 +1,6 @@
 import json
 import time
-import threading
-from datetime import datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor
 try:
     import obsws_python as obs
 except ImportError:
@@ -14,6 +13,14 @@ except ImportError:
     print("⚠️ 统计模块导入失败，将禁用统计功能")
     SwitchStatistics = None
 
+from compiled_config import compile_config
+from timer_scheduler import get_scheduler
+from lock_metrics import TimedLock
+from obs_actor import OBSRequestActor, PRIORITY_SWITCH, PRIORITY_NORMAL, PRIORITY_INVENTORY
+from speech_parser import SpeechRecord
+from vote_window import VoteBallot
+from pending_requests import PendingRequestQueue
+
 try:
     from source_manager import SourceManager
 except ImportError:
@@ -23,24 +30,45 @@ except ImportError:
 class OBSManager:
     """OBS WebSocket管理器"""
     
-    def __init__(self, config_path="obs_config.json"):
+    def __init__(self, config_path="obs_config.json", statistics=None, config=None, compiled=None):
         """
         初始化OBS管理器
         :param config_path: 配置文件路径
+        :param statistics: 共享的统计管理器实例，为None时自动创建
+        :param config: 已加载的配置（多个管理器共享同一配置文件时避免重复加载）
+        :param compiled: 已编译的配置（多个管理器共享同一配置文件时避免重复编译），优先于 config
         """
         self.config_path = config_path
-        self.config = self.load_config()
-        self.ws = None
+        if compiled is not None:
+            config = compiled.raw
+        self.config = config if config is not None else self.load_config()
+        # 热路径只读取编译后的只读配置，重新加载时整体替换
+        self.compiled = compiled if compiled is not None else compile_config(self.config)
+        self.ws = None  # OBS 客户端代理：请求在 obs_actor 的 I/O 线程中排队执行
+        self.obs_actor = None  # 独占 OBS 连接的请求执行线程
         self.connected = False
         self.current_scene = None
-        self.switch_end_time = None
-        self.switch_lock = threading.Lock()
+        self.cooldown_until = None  # 冷却截止时间（time.monotonic，不受系统时间校正影响）
+        self.cooldown_deadline = None  # 同一截止时间的系统时间，进入冷却时计算一次，供断点保存
+        # 切换锁只保护内存状态，记录持有时间以确认保持在微秒级
+        self.switch_lock = TimedLock()
+        self._switch_generation = 0  # 每次切换加一，用于识别过期的返回默认场景任务和失败回滚
+        # OBS 切换请求由 obs_actor 按优先级执行，统计写库在统计线程中执行，都不占用切换锁
+        self._stats_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="switch-stats")
+        self.switch_results = {"succeeded": 0, "failed": 0}
+        # 延迟切换、返回默认场景和投票结束都由共享的调度线程执行
+        self.scheduler = get_scheduler()
         self.switch_timer = None
         self.delay_timer = None  # 延迟切换定时器
+        self.pending_switch = None  # 等待延迟执行的切换（用于断点保存）
+        self.switched_scene = None  # 当前冷却期对应的场景
+        self.ballot = None  # 投票模式下正在进行的投票
+        self.pending_requests = PendingRequestQueue()  # 冷却期间收到的切换请求
+        self.vote_timer = None
         
         # 初始化统计系统
-        self.statistics = None
-        if SwitchStatistics:
+        self.statistics = statistics
+        if self.statistics is None and SwitchStatistics:
             try:
                 self.statistics = SwitchStatistics()
             except Exception as e:
@@ -68,17 +96,32 @@ class OBSManager:
             print(f"❌ 配置文件格式错误: {e}")
             return None
     
+    @property
+    def config_version(self):
+        """当前配置的版本号，配置每次变化时递增，用于让解析结果缓存失效"""
+        compiled = self.compiled
+        return compiled.version if compiled else 0
+    
+    def apply_config(self, compiled):
+        """
+        应用编译好的新配置（一次引用赋值，正在进行的切换不会看到一半的配置）
+        :param compiled: CompiledConfig 实例
+        """
+        if compiled is None:
+            return
+        self.compiled = compiled
+        self.config = compiled.raw
+    
     def reload_config(self):
         """重新加载配置文件"""
-        old_config = self.config
-        self.config = self.load_config()
+        config = self.load_config()
         
-        if self.config:
+        if config:
+            self.apply_config(compile_config(config))
             print(f"✅ 配置文件已重新加载")
             return True
         else:
             print(f"❌ 配置文件重新加载失败，恢复旧配置")
-            self.config = old_config
             return False
     
     def save_config(self):
@@ -103,12 +146,17 @@ class OBSManager:
         
         try:
             conn_config = self.config["obs_connection"]
-            self.ws = obs.ReqClient(
+            client = obs.ReqClient(
                 host=conn_config["host"],
                 port=conn_config["port"],
                 password=conn_config["password"],
                 timeout=conn_config.get("connect_timeout", 5)
             )
+            # 连接建立后客户端只在 I/O 线程中使用
+            if self.obs_actor:
+                self.obs_actor.stop(drain=False)
+            self.obs_actor = OBSRequestActor(client)
+            self.ws = self.obs_actor.client_proxy(PRIORITY_NORMAL)
             
             # 测试连接
             version_info = self.ws.get_version()
@@ -123,9 +171,9 @@ class OBSManager:
             self.current_scene = current_scene_resp.current_program_scene_name
             print(f"   🎬 当前场景: {self.current_scene}")
             
-            # 设置源管理器的OBS客户端
+            # 设置源管理器的OBS客户端：源信息轮询排在场景切换之后
             if self.source_manager:
-                self.source_manager.set_obs_client(self.ws)
+                self.source_manager.set_obs_client(self.obs_actor.client_proxy(PRIORITY_INVENTORY))
                 print(f"   📡 源管理器已连接")
             
             return True
@@ -133,21 +181,35 @@ class OBSManager:
         except Exception as e:
             print(f"❌ 连接OBS失败: {e}")
             self.connected = False
+            if self.obs_actor:
+                self.obs_actor.stop(drain=False)
+                self.obs_actor = None
+                self.ws = None
             return False
     
     def disconnect(self):
         """断开OBS连接"""
+        for timer in (self.vote_timer, self.delay_timer, self.switch_timer):
+            if timer:
+                timer.cancel()
         # 停止源管理器监控
         if self.source_manager:
             self.source_manager.stop_source_monitoring()
+        # 等待已提交的切换请求和统计写库完成
+        if self.obs_actor:
+            self.obs_actor.stop(drain=True)
+            self.obs_actor.print_stats()
+        self._stats_executor.shutdown(wait=True)
             
-        if self.ws:
+        if self.obs_actor:
             try:
-                self.ws.disconnect()
+                self.obs_actor.client.disconnect()
                 self.connected = False
                 print("🔌 已断开OBS连接")
             except Exception as e:
                 print(f"⚠️ 断开连接时出错: {e}")
+            self.obs_actor = None
+            self.ws = None
     
     def get_scene_list(self):
         """获取所有场景列表"""
@@ -185,11 +247,13 @@ class OBSManager:
         scenes_config = {}
         
         for i, scene_name in enumerate(scene_names, 1):
-            # 查找现有配置中是否有这个场景的自定义切换命令
+            # 查找现有配置中是否有这个场景的自定义切换命令和别名
             existing_switch_cmd = None
+            existing_aliases = None
             for existing_id, existing_info in existing_scenes.items():
                 if existing_info.get("场景名称") == scene_name:
                     existing_switch_cmd = existing_info.get("切换命令")
+                    existing_aliases = existing_info.get("aliases")
                     break
             
             # 如果有自定义切换命令就保持，否则使用默认序号
@@ -202,15 +266,22 @@ class OBSManager:
                 "enabled": True,
                 "description": f"场景{i}: {scene_name}"
             }
+            if existing_aliases:
+                scenes_config[str(i)]["aliases"] = existing_aliases
         
-        self.config["scene_settings"]["scenes"] = scenes_config
+        # 在副本上修改，编译完成后整体替换（其他线程和共享此配置的管理器不会看到修改了一半的配置）
+        scene_settings = dict(self.config["scene_settings"])
+        scene_settings["scenes"] = scenes_config
         
         # 设置默认场景（如果不存在或不在列表中）
-        default_scene = self.config["scene_settings"]["default_scene"]
+        default_scene = scene_settings["default_scene"]
         if default_scene not in scene_names:
             if scene_names:
-                self.config["scene_settings"]["default_scene"] = scene_names[0]
+                scene_settings["default_scene"] = scene_names[0]
                 print(f"🔄 默认场景已更新为: {scene_names[0]}")
+        config = dict(self.config)
+        config["scene_settings"] = scene_settings
+        self.apply_config(compile_config(config))
         
         if self.save_config():
             print(f"✅ 场景配置已更新到 {self.config_path}（保持自定义切换命令）")
@@ -219,13 +290,13 @@ class OBSManager:
         return False
     
     def switch_scene(self, scene_name):
-        """切换到指定场景"""
-        if not self.connected or not self.ws:
+        """切换到指定场景（等待 OBS 返回结果）"""
+        if not self.connected or not self.obs_actor:
             print("❌ OBS未连接")
             return False
         
         try:
-            self.ws.set_current_program_scene(scene_name)
+            self.obs_actor.call("set_current_program_scene", scene_name, priority=PRIORITY_SWITCH)
             self.current_scene = scene_name
             print(f"🎬 场景已切换到: {scene_name}")
             return True
@@ -233,243 +304,428 @@ class OBSManager:
             print(f"❌ 切换场景失败: {e}")
             return False
     
-    def _find_nearest_scene(self, number_str):
+    def _request_switch(self, scene_name):
+        """
+        提交场景切换请求（最高优先级，不等待结果）
+        :param scene_name: 场景名称
+        :return: Future，OBS 未连接时为已失败的 Future
         """
-        智能场景映射：当没有精确匹配的场景时，找到最接近的可用场景
-        映射规则：
-        - 14.5 → 14（没有14.5场景）
-        - [12, 14) → 12
-        - [10, 12) → 10  
-        - [8, 10) → 8
-        - [6, 8) → 6
-        - <6 → 6（最小场景）
+        actor = self.obs_actor
+        if not self.connected or not actor:
+            future = Future()
+            future.set_exception(ConnectionError("OBS未连接"))
+            return future
+        return actor.submit("set_current_program_scene", scene_name, priority=PRIORITY_SWITCH)
+    
+    def resolve_scene(self, number):
+        """
+        查找切换命令对应的场景（精确匹配，找不到时按 nearest_mapping 智能映射）
+        :param number: 切换命令
+        :return: (目标场景名称, 最终切换命令)，找不到时场景名称为None
+        """
+        compiled = self.compiled
+        if not compiled:
+            return None, number
         
-        :param number_str: 输入的数字字符串
-        :return: 映射后的场景切换命令或None
+        target_scene, final_number, mapped = compiled.scene_resolver.resolve(number)
+        if mapped:
+            print(f"🎯 智能映射结果: {number} → {final_number}")
+        return target_scene, final_number
+    
+    def switch_scene_by_number(self, number, user_content="", resolved=None):
         """
-        try:
-            input_number = float(number_str)
-            
-            # 定义可用的场景范围（从配置中获取实际可用的数字场景）
-            scenes = self.config["scene_settings"]["scenes"]
-            available_scenes = []
-            
-            for scene_id, scene_info in scenes.items():
-                if scene_info.get("enabled", True):
-                    # 获取场景的数字值
-                    switch_cmd = scene_info.get("切换命令", str(scene_info.get("number", "")))
-                    try:
-                        # 只考虑纯数字的场景（不包括116、114等特殊场景，不包括9默认场景）
-                        scene_num = float(switch_cmd)
-                        # 只包括6、8、10、12、14这些数字场景
-                        if switch_cmd in ['6', '8', '10', '12', '14'] and switch_cmd == str(int(scene_num)):
-                            available_scenes.append((scene_num, switch_cmd))
-                    except (ValueError, TypeError):
-                        continue
-            
-            # 按数字大小排序
-            available_scenes.sort()
-            
-            if not available_scenes:
-                return None
-            
-            # 智能映射逻辑
-            print(f"🔍 智能场景映射：输入数字 {input_number}")
-            
-            # 首先检查是否有精确匹配
-            for scene_num, switch_cmd in available_scenes:
-                if scene_num == input_number:
-                    print(f"✅ 找到精确匹配场景: {switch_cmd}")
-                    return switch_cmd
-            
-            # 没有精确匹配，进行智能映射
-            # 按照映射规则找到合适的场景
-            mapped_scene = None
-            
-            if input_number >= 14:
-                # >= 14 映射到 14
-                for scene_num, switch_cmd in reversed(available_scenes):
-                    if scene_num >= 14:
-                        mapped_scene = switch_cmd
-                        break
-                if not mapped_scene:
-                    # 如果没有14，找最大的可用场景
-                    mapped_scene = available_scenes[-1][1]
-                    
-            elif input_number >= 12:
-                # [12, 14) 映射到 12
-                for scene_num, switch_cmd in available_scenes:
-                    if scene_num >= 12:
-                        mapped_scene = switch_cmd
-                        break
-                        
-            elif input_number >= 10:
-                # [10, 12) 映射到 10
-                for scene_num, switch_cmd in available_scenes:
-                    if scene_num >= 10:
-                        mapped_scene = switch_cmd
-                        break
-                        
-            elif input_number >= 8:
-                # [8, 10) 映射到 8
-                for scene_num, switch_cmd in available_scenes:
-                    if scene_num >= 8:
-                        mapped_scene = switch_cmd
-                        break
-                        
-            elif input_number >= 6:
-                # [6, 8) 映射到 6
-                for scene_num, switch_cmd in available_scenes:
-                    if scene_num >= 6:
-                        mapped_scene = switch_cmd
-                        break
-            else:
-                # <6 映射到 6（最小场景）
-                for scene_num, switch_cmd in available_scenes:
-                    if scene_num >= 6:
-                        mapped_scene = switch_cmd
-                        break
-                        
-            if mapped_scene:
-                print(f"🎯 智能映射结果: {input_number} → {mapped_scene}")
-                return mapped_scene
-            else:
-                print(f"❌ 无法找到合适的映射场景")
-                return None
-                
-        except (ValueError, TypeError):
-            # 如果不是有效数字，返回None
-            return None
+        根据数字切换场景（支持延迟切换和智能映射）
+        :param number: 切换命令
+        :param user_content: 用户发言内容
+        :param resolved: 已查找好的 (目标场景名称, 最终切换命令)，为None时调用 resolve_scene 查找
+        """
+        return self.switch_scene_by_record(SpeechRecord.from_command(number, user_content), resolved)
     
-    def switch_scene_by_number(self, number, user_content=""):
-        """根据数字切换场景（支持延迟切换和智能映射）"""
-        if not self.config:
+    def switch_scene_by_record(self, record, resolved=None):
+        """
+        根据解析好的发言记录切换场景（支持延迟切换和智能映射）
+        切换锁内只更新内存状态，OBS 请求、统计写库和输出都在锁外完成
+        :param record: SpeechRecord，record.command 为切换命令
+        :param resolved: 已查找好的 (目标场景名称, 最终切换命令)，为None时调用 resolve_scene 查找
+        :return: 切换请求是否被接受（延迟切换、投票或已提交立即切换）
+        """
+        compiled = self.compiled  # 本次切换始终使用同一份配置
+        if not compiled:
             print("❌ 配置文件未加载")
             return False
-            
+        
+        number = record.command
+        # 场景查找只读配置，不需要持有切换锁
+        target_scene, final_number = resolved if resolved is not None else self.resolve_scene(number)
+        if not target_scene:
+            print(f"❌ 未找到切换命令 {number} 对应的场景（包括智能映射）")
+            return False
+        
+        delay_seconds = compiled.switch_delay
+        vote = None
+        job = None
+        queued = None
+        cancelled_delay = False
         with self.switch_lock:
             # 检查是否在切换冷却期间
-            if self.switch_end_time and datetime.now() < self.switch_end_time:
-                remaining = (self.switch_end_time - datetime.now()).total_seconds()
-                print(f"⏳ 场景切换冷却中，剩余 {remaining:.0f} 秒")
-                return False
-            
-            # 取消之前的延迟定时器
-            if self.delay_timer:
-                self.delay_timer.cancel()
-                print("⏹️ 取消之前的延迟切换")
-            
-            # 查找对应的场景
-            scenes = self.config["scene_settings"]["scenes"]
-            target_scene = None
-            final_number = number  # 用于记录的最终数字
-            
-            # 首先尝试精确匹配
-            for scene_id, scene_info in scenes.items():
-                # 支持新格式：通过"切换命令"匹配
-                if "切换命令" in scene_info and scene_info["切换命令"] == str(number) and scene_info.get("enabled", True):
-                    target_scene = scene_info.get("场景名称", scene_info.get("name"))
-                    break
-                # 兼容旧格式：通过number字段匹配（只处理整数）
-                elif scene_info.get("number") and scene_info.get("enabled", True):
-                    try:
-                        # 只有当number是整数时才进行比较
-                        if "." not in str(number) and scene_info.get("number") == int(number):
-                            target_scene = scene_info.get("场景名称", scene_info.get("name"))
-                            break
-                    except ValueError:
-                        # 如果number不能转换为整数，跳过这个匹配
-                        continue
-            
-            # 如果没有精确匹配，尝试智能映射
-            if not target_scene:
-                mapped_number = self._find_nearest_scene(str(number))
-                if mapped_number:
-                    # 使用映射后的数字再次查找场景
-                    for scene_id, scene_info in scenes.items():
-                        if "切换命令" in scene_info and scene_info["切换命令"] == str(mapped_number) and scene_info.get("enabled", True):
-                            target_scene = scene_info.get("场景名称", scene_info.get("name"))
-                            final_number = mapped_number  # 更新最终数字为映射后的值
-                            break
-            
-            if not target_scene:
-                print(f"❌ 未找到切换命令 {number} 对应的场景（包括智能映射）")
-                return False
-            
-            # 获取延迟参数
-            delay_seconds = self.config["scene_settings"].get("switch_delay", 5)
-            
-            if delay_seconds > 0:
-                print(f"⏰ 检测到切换命令 {number}，{delay_seconds}秒后切换到场景: {target_scene}")
-                
-                # 设置延迟定时器
-                self.delay_timer = threading.Timer(delay_seconds, self._delayed_switch, args=[target_scene, final_number, user_content])
-                self.delay_timer.start()
-                
-                return True
+            remaining = self._cooldown_remaining()
+            if remaining > 0:
+                if compiled.pending_policy:
+                    # 冷却期间的请求排队，冷却结束时直接切换到下一个被请求的场景
+                    queued = self._queue_request(target_scene, final_number, record, compiled)
             else:
-                # 无延迟，直接切换
-                return self._delayed_switch(target_scene, final_number, user_content)
+                if compiled.vote_window > 0:
+                    # 投票模式：计入当前投票窗口，窗口结束时切换到票数最多的场景
+                    vote = self._submit_vote(record, target_scene, final_number)
+                else:
+                    # 取消之前的延迟定时器
+                    if self.delay_timer:
+                        self.delay_timer.cancel()
+                        self.delay_timer = None
+                        cancelled_delay = True
+                    if delay_seconds > 0:
+                        self._schedule_delayed_switch(delay_seconds, target_scene, final_number, record)
+                    else:
+                        # 无延迟：立即进入冷却，OBS 请求在锁外执行
+                        job = self._begin_switch(target_scene, final_number, record, compiled)
+        
+        if remaining > 0:
+            if queued is not None:
+                count, size = queued
+                print(f"📥 场景切换冷却中（剩余 {remaining:.0f} 秒），已加入待切换队列: {target_scene}"
+                      f"（{count} 人请求，队列中 {size} 个场景）")
+                return True
+            print(f"⏳ 场景切换冷却中，剩余 {remaining:.0f} 秒")
+            return False
+        if vote is not None:
+            started, votes = vote
+            if started:
+                print(f"🗳️ 开始收集场景投票，{compiled.vote_window}秒后切换到票数最多的场景")
+            print(f"🗳️ 投票: {target_scene}（{votes} 票）")
+            return True
+        if cancelled_delay:
+            print("⏹️ 取消之前的延迟切换")
+        if delay_seconds > 0:
+            print(f"⏰ 检测到切换命令 {number}，{delay_seconds}秒后切换到场景: {target_scene}")
+            return True
+        self._dispatch_switch(job)
+        return True
+    
+    def get_vote_window(self):
+        """
+        获取投票窗口长度
+        :return: 秒数，0 表示不使用投票模式（第一条命令生效）
+        """
+        compiled = self.compiled
+        return compiled.vote_window if compiled else 0
+    
+    def _submit_vote(self, record, target_scene, number):
+        """
+        把一条切换请求计入投票窗口（调用时已持有 switch_lock）
+        :param record: 发言记录（SpeechRecord）
+        :param target_scene: 目标场景名称
+        :param number: 最终切换命令
+        :return: (是否新开始了投票, 该场景当前的票数)
+        """
+        started = self.ballot is None
+        if started:
+            self.ballot = VoteBallot()
+            self.vote_timer = self.scheduler.call_later(self.get_vote_window(), self._close_vote)
+        return started, self.ballot.add(record.username, target_scene, number, record)
+    
+    def _close_vote(self):
+        """投票窗口结束：切换到票数最多的场景"""
+        with self.switch_lock:
+            ballot = self.ballot
+            self.ballot = None
+            self.vote_timer = None
+        if ballot is None:
+            return
+        
+        result = ballot.winner()
+        if result is None:
+            return
+        target_scene, number, record, votes = result
+        ranking = "，".join(f"{scene} {count} 票" for scene, count in ballot.ranking())
+        print(f"🗳️ 投票结束：{ballot.voter_count} 人参与，{ballot.total_requests} 条请求（{ranking}）")
+        print(f"🏆 票数最多的场景: {target_scene}（{votes} 票）")
+        self._delayed_switch(target_scene, number, record)
     
-    def _delayed_switch(self, target_scene, number, user_content=""):
-        """延迟切换的实际执行方法"""
+    def _schedule_delayed_switch(self, delay_seconds, target_scene, number, record):
+        """
+        设置延迟切换定时器（调用时已持有 switch_lock）
+        :param delay_seconds: 延迟时间（秒）
+        :param target_scene: 目标场景名称
+        :param number: 最终切换命令（智能映射后）
+        :param record: 触发切换的发言记录（SpeechRecord）
+        """
+        self.pending_switch = {
+            "scene": target_scene,
+            "number": str(number),
+            "content": record.content,
+            "due": time.time() + delay_seconds
+        }
+        self.delay_timer = self.scheduler.call_later(delay_seconds, self._delayed_switch, target_scene, number, record)
+    
+    def _delayed_switch(self, target_scene, number, record):
+        """
+        延迟切换到期（在调度线程中执行）：锁内进入冷却，OBS 请求交给切换线程
+        :param target_scene: 目标场景名称
+        :param number: 最终切换命令（智能映射后）
+        :param record: 触发切换的发言记录（SpeechRecord）
+        :return: 切换是否已提交
+        """
+        job = None
+        queued = None
+        compiled = self.compiled
         with self.switch_lock:
+            self.pending_switch = None
+            self.delay_timer = None
             # 再次检查是否在冷却期
-            if self.switch_end_time and datetime.now() < self.switch_end_time:
-                remaining = (self.switch_end_time - datetime.now()).total_seconds()
-                print(f"⏳ 场景切换冷却中，取消延迟切换，剩余 {remaining:.0f} 秒")
-                return False
-            
-            # 执行场景切换
-            if self.switch_scene(target_scene):
-                # 记录统计信息
-                if self.statistics:
-                    try:
-                        self.statistics.record_switch(user_content, number, target_scene)
-                    except Exception as e:
-                        print(f"⚠️ 记录统计失败: {e}")
-                
-                # 设置切换时间和定时器
-                duration = self.config["scene_settings"]["switch_duration"]
-                self.switch_end_time = datetime.now() + timedelta(seconds=duration)
-                
-                print(f"⏰ 场景切换成功，{duration}秒后自动回到默认场景")
-                
-                # 取消之前的定时器
-                if self.switch_timer:
-                    self.switch_timer.cancel()
-                
-                # 设置新的定时器
-                self.switch_timer = threading.Timer(duration, self._return_to_default)
-                self.switch_timer.start()
-                
+            remaining = self._cooldown_remaining()
+            if remaining <= 0:
+                job = self._begin_switch(target_scene, number, record, compiled)
+            elif compiled.pending_policy:
+                queued = self._queue_request(target_scene, number, record, compiled)
+        
+        if job is None:
+            if queued is not None:
+                print(f"📥 场景切换冷却中，延迟切换已加入待切换队列: {target_scene}，剩余 {remaining:.0f} 秒")
                 return True
-            
+            print(f"⏳ 场景切换冷却中，取消延迟切换，剩余 {remaining:.0f} 秒")
             return False
+        self._dispatch_switch(job)
+        return True
     
-    def _return_to_default(self):
-        """返回默认场景"""
-        if not self.config:
+    def _queue_request(self, target_scene, number, record, compiled):
+        """
+        把冷却期间的切换请求加入待切换队列（调用时已持有 switch_lock）
+        :param target_scene: 目标场景名称
+        :param number: 最终切换命令
+        :param record: 发言记录（SpeechRecord）
+        :param compiled: 当前配置
+        :return: (该场景的请求人数, 队列中的场景数)
+        """
+        return self.pending_requests.add(target_scene, number, record,
+                                         compiled.pending_max_size, compiled.pending_max_age)
+    
+    def _begin_switch(self, target_scene, number, record, compiled):
+        """
+        切换的状态转换（调用时已持有 switch_lock，只更新内存状态）
+        先进入冷却并安排返回默认场景，OBS 切换失败时再撤销
+        :param target_scene: 目标场景名称
+        :param number: 最终切换命令
+        :param record: 触发切换的发言记录（SpeechRecord）
+        :param compiled: 本次切换使用的配置
+        :return: 交给 _dispatch_switch 的切换任务
+        """
+        duration = compiled.switch_duration
+        self._switch_generation += 1
+        generation = self._switch_generation
+        self.cooldown_until = time.monotonic() + duration
+        self.cooldown_deadline = time.time() + duration
+        self.switched_scene = target_scene
+        if self.switch_timer:
+            self.switch_timer.cancel()
+        self.switch_timer = self.scheduler.call_later(duration, self._return_to_default, generation)
+        return generation, target_scene, number, record, duration
+    
+    def _dispatch_switch(self, job):
+        """
+        提交 OBS 切换请求（按提交顺序执行，不阻塞调用方），完成后回调 _finish_switch
+        :param job: _begin_switch 返回的切换任务
+        :return: Future，结果为OBS请求的返回值
+        """
+        future = self._request_switch(job[1])
+        future.add_done_callback(lambda done: self._finish_switch(done, *job))
+        return future
+    
+    def _finish_switch(self, future, generation, target_scene, number, record, duration):
+        """
+        切换请求完成（在 OBS I/O 线程中回调）：成功时异步记录统计，失败时撤销冷却
+        :param future: 切换请求的 Future
+        :param generation: 本次切换的序号（用于判断状态是否已被更新的切换覆盖）
+        :param target_scene: 目标场景名称
+        :param number: 最终切换命令
+        :param record: 触发切换的发言记录（SpeechRecord）
+        :param duration: 冷却时间（秒）
+        """
+        error = future.exception()
+        if error is None:
+            self.current_scene = target_scene
+            self.switch_results["succeeded"] += 1
+            print(f"🎬 场景已切换到: {target_scene}")
+            print(f"⏰ 场景切换成功，{duration}秒后自动回到默认场景")
+            if self.statistics:
+                self._stats_executor.submit(self._record_statistics, record, number, target_scene)
             return
-            
-        default_scene = self.config["scene_settings"]["default_scene"]
-        if default_scene and self.switch_scene(default_scene):
-            print(f"🏠 已自动返回默认场景: {default_scene}")
         
+        print(f"❌ 切换场景失败: {error}")
+        self.switch_results["failed"] += 1
         with self.switch_lock:
-            self.switch_end_time = None
+            rollback = generation == self._switch_generation
+            if rollback:
+                self.cooldown_until = None
+                self.cooldown_deadline = None
+                self.switched_scene = None
+                if self.switch_timer:
+                    self.switch_timer.cancel()
+                    self.switch_timer = None
+        if rollback:
+            print("↩️ 场景切换失败，已撤销冷却")
+    
+    def _record_statistics(self, record, number, target_scene):
+        """在统计线程中记录一次成功的切换（写库不占用切换线程）"""
+        try:
+            self.statistics.record_switch(record, number, target_scene)
+        except Exception as e:
+            print(f"⚠️ 记录统计失败: {e}")
+    
+    def _return_to_default(self, generation=None):
+        """
+        冷却结束：有排队的切换请求时直接切换到下一个场景，否则返回默认场景
+        :param generation: 安排此任务的切换序号，已有更新的切换时忽略；为None时无条件返回
+        """
+        compiled = self.compiled
+        if not compiled:
+            return
+        
+        job = None
+        with self.switch_lock:
+            if generation is not None and generation != self._switch_generation:
+                return
+            entry = None
+            if compiled.pending_policy:
+                entry = self.pending_requests.pop(compiled.pending_policy, compiled.pending_max_age)
+            elif len(self.pending_requests):
+                # 队列已在配置中关闭
+                self.pending_requests.clear()
+            if entry is not None:
+                job = self._begin_switch(entry.scene, entry.number, entry.record, compiled)
+            else:
+                self.cooldown_until = None
+                self.cooldown_deadline = None
+                self.switched_scene = None
+                self.switch_timer = None
+        
+        if job is not None:
+            print(f"📤 冷却结束，切换到待切换队列中的场景: {entry.scene}（{entry.count} 人请求）")
+            self._dispatch_switch(job)
+            return
+        
+        default_scene = compiled.default_scene
+        if default_scene:
+            future = self._request_switch(default_scene)
+            future.add_done_callback(lambda done: self._finish_return(done, default_scene))
+    
+    def _finish_return(self, future, default_scene):
+        """返回默认场景的请求完成（在 OBS I/O 线程中回调）"""
+        error = future.exception()
+        if error is None:
+            self.current_scene = default_scene
+            print(f"🏠 已自动返回默认场景: {default_scene}")
+        else:
+            print(f"❌ 返回默认场景失败: {error}")
+    
+    def get_switch_stats(self):
+        """
+        获取切换执行统计和切换锁的持有时间
+        :return: 统计字典
+        """
+        stats = dict(self.switch_results)
+        stats["lock"] = self.switch_lock.get_stats()
+        stats["obs"] = self.obs_actor.get_stats() if self.obs_actor else {}
+        stats["pending"] = self.pending_requests.get_stats()
+        return stats
+    
+    def export_state(self):
+        """
+        导出切换状态（用于断点保存）
+        :return: 状态字典
+        """
+        with self.switch_lock:
+            # 断点跨越进程重启，保存进入冷却时算好的系统时间（每次导出的值相同，内容不变时断点不重写）
+            cooldown_until = self.cooldown_deadline if self._cooldown_remaining() > 0 else None
+            return {
+                "cooldown_until": cooldown_until,
+                "switched_scene": self.switched_scene,
+                "pending_switch": dict(self.pending_switch) if self.pending_switch else None,
+                "pending_requests": self.pending_requests.export()
+            }
+    
+    def restore_state(self, state, max_late=60):
+        """
+        从断点恢复切换状态
+        :param state: export_state() 导出的状态
+        :param max_late: 待执行的切换最多允许迟到的秒数，超过则丢弃
+        """
+        if not state or not self.config:
+            return
+        
+        now = time.time()
+        # 先恢复冷却期间排队的请求，冷却已结束时下面的 _return_to_default 会直接切换到队列中的场景
+        compiled = self.compiled
+        queued = state.get("pending_requests")
+        if queued and compiled and compiled.pending_policy:
+            restored = self.pending_requests.restore(queued, compiled.pending_max_size, compiled.pending_max_age)
+            if restored:
+                print(f"♻️ 已恢复待切换队列: {restored} 个场景")
+        
+        cooldown_until = state.get("cooldown_until")
+        if cooldown_until:
+            with self.switch_lock:
+                if cooldown_until > now:
+                    # 冷却仍未结束：恢复截止时间和返回默认场景的定时器
+                    remaining = cooldown_until - now
+                    self.cooldown_until = time.monotonic() + remaining
+                    self.cooldown_deadline = cooldown_until
+                    self.switched_scene = state.get("switched_scene")
+                    self._switch_generation += 1
+                    if self.switch_timer:
+                        self.switch_timer.cancel()
+                    self.switch_timer = self.scheduler.call_later(remaining, self._return_to_default,
+                                                                  self._switch_generation)
+                    restore_default = False
+                else:
+                    restore_default = True
+            if not restore_default:
+                print(f"♻️ 已恢复场景切换冷却，剩余 {remaining:.0f} 秒")
+            else:
+                # 停机期间冷却已结束，OBS 仍停留在切换后的场景
+                print("♻️ 停机期间冷却已结束，返回默认场景")
+                self._return_to_default()
+        
+        pending = state.get("pending_switch")
+        if pending and pending.get("scene"):
+            late = now - pending.get("due", now)
+            if late > max_late:
+                print(f"⏭️ 丢弃过期的延迟切换: {pending.get('scene')}（已过期 {late:.0f} 秒）")
+                return
+            with self.switch_lock:
+                if self._cooldown_remaining() > 0:
+                    return
+                delay = max(0.0, -late)
+                record = SpeechRecord.from_command(pending.get("number", ""), pending.get("content", ""))
+                self._schedule_delayed_switch(delay, pending["scene"], pending.get("number", ""), record)
+            print(f"♻️ 已恢复延迟切换: {pending['scene']}，{delay:.0f} 秒后执行")
+    
+    def _cooldown_remaining(self):
+        """
+        计算剩余冷却时间（单调时钟）
+        :return: 秒数，不在冷却期时为0
+        """
+        cooldown_until = self.cooldown_until
+        if cooldown_until is None:
+            return 0
+        return max(0, cooldown_until - time.monotonic())
     
     def is_in_cooldown(self):
         """检查是否在冷却期"""
-        if self.switch_end_time:
-            return datetime.now() < self.switch_end_time
-        return False
+        return self._cooldown_remaining() > 0
     
     def get_cooldown_remaining(self):
         """获取剩余冷却时间"""
-        if self.is_in_cooldown() and self.switch_end_time:
-            return (self.switch_end_time - datetime.now()).total_seconds()
-        return 0
+        return self._cooldown_remaining()
     
     def print_scene_mapping(self):
         """打印场景映射信息（支持新配置格式）"""
@@ -500,6 +756,12 @@ class OBSManager:
         print(f"\n🏠 默认场景: {default_scene}")
         print(f"⏰ 切换保持时间: {duration}秒")
         print(f"⏳ 切换延迟时间: {delay}秒")
+        resolver = self.compiled.scene_resolver
+        if resolver.candidates:
+            print(f"🎯 智能映射: 候选场景 {'/'.join(resolver.candidates)}，取整规则 {resolver.rounding}")
+        if self.compiled.pending_policy:
+            print(f"📥 冷却期待切换队列: {self.compiled.pending_policy}，最多 {self.compiled.pending_max_size} 个场景，"
+                  f"{self.compiled.pending_max_age} 秒无人请求即过期")
     
     def get_sources_info(self):
         """获取所有场景的源信息"""
@@ -0,0 +1,190 @@
+"""
+冷却期待切换队列模块
+功能：
+1. 场景切换冷却期间收到的切换请求不再丢弃，按场景去重后排队
+2. 冷却结束时直接切换到下一个被请求的场景，没有请求时才回到默认场景
+3. 支持三种选择策略：latest_wins（最新请求）、fifo（最先请求）、most_requested（请求人数最多）
+4. 队列长度有上限，超过 max_age 秒没有人再请求的场景自动过期
+5. 可以导出到断点并在重启后恢复
+"""
+
+import threading
+import time
+from speech_parser import SpeechRecord
+
+POLICIES = ("latest_wins", "fifo", "most_requested")
+
+
+class PendingRequest:
+    """一个场景的排队请求"""
+
+    __slots__ = ("scene", "number", "record", "users", "count", "first_seen", "last_seen",
+                 "first_time", "last_time")
+
+    def __init__(self, scene, number, record, now, wall_now):
+        self.scene = scene
+        self.number = number
+        self.record = record      # 最近一次请求的发言记录
+        self.users = set()        # 请求过的用户（同一用户只算一次）
+        self.count = 0            # 请求人数
+        self.first_seen = now     # 单调时钟，用于排序和过期
+        self.last_seen = now
+        self.first_time = wall_now  # 对应的系统时间，用于断点保存（跨越进程重启）
+        self.last_time = wall_now
+
+
+class PendingRequestQueue:
+    """按场景去重的待切换队列"""
+
+    def __init__(self):
+        """初始化空队列（策略、长度和过期时间在每次调用时传入，配置热加载后立即生效）"""
+        self._lock = threading.Lock()
+        self._entries = {}  # 场景名称 -> PendingRequest（插入顺序即首次请求顺序）
+        self.queued = 0
+        self.served = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _expire(self, max_age, now):
+        """删除超过 max_age 秒没有新请求的场景（调用时已持有锁）"""
+        if not max_age:
+            return
+        stale = [scene for scene, entry in self._entries.items() if now - entry.last_seen > max_age]
+        for scene in stale:
+            del self._entries[scene]
+        self.expired += len(stale)
+
+    def add(self, scene, number, record, max_size=10, max_age=0, now=None):
+        """
+        加入一条切换请求（同一场景合并）
+        :param scene: 目标场景名称
+        :param number: 最终切换命令
+        :param record: 发言记录（SpeechRecord）
+        :param max_size: 最多排队的场景数，超过时淘汰最久没有人请求的场景
+        :param max_age: 过期时间（秒），为0时不过期
+        :param now: 当前时间（单调时钟），为None时自动获取
+        :return: (该场景的请求人数, 队列中的场景数)
+        """
+        now = time.monotonic() if now is None else now
+        wall_now = time.time()
+        with self._lock:
+            self._expire(max_age, now)
+            entry = self._entries.get(scene)
+            if entry is None:
+                self._evict_for(max_size)
+                entry = self._entries[scene] = PendingRequest(scene, number, record, now, wall_now)
+
+            user = record.username
+            if user is None or user not in entry.users:
+                if user is not None:
+                    entry.users.add(user)
+                entry.count += 1
+            entry.number = number
+            entry.record = record
+            entry.last_seen = now
+            entry.last_time = wall_now
+            self.queued += 1
+            return entry.count, len(self._entries)
+
+    def _evict_for(self, max_size):
+        """队列已满时淘汰最久没有人请求的场景（调用时已持有锁）"""
+        if len(self._entries) >= max(1, max_size):
+            stalest = min(self._entries.values(), key=lambda item: item.last_seen)
+            del self._entries[stalest.scene]
+            self.evicted += 1
+
+    def pop(self, policy="latest_wins", max_age=0, now=None):
+        """
+        按策略取出下一个要切换的场景
+        :param policy: latest_wins / fifo / most_requested
+        :param max_age: 过期时间（秒），为0时不过期
+        :param now: 当前时间（单调时钟），为None时自动获取
+        :return: PendingRequest，队列为空时返回None
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._expire(max_age, now)
+            if not self._entries:
+                return None
+            entries = self._entries.values()
+            if policy == "fifo":
+                entry = next(iter(entries))
+            elif policy == "most_requested":
+                entry = min(entries, key=lambda item: (-item.count, item.first_seen))
+            else:
+                entry = max(entries, key=lambda item: item.last_seen)
+            del self._entries[entry.scene]
+            self.served += 1
+            return entry
+
+    def export(self):
+        """
+        导出队列（用于断点保存，时间为系统时间，内容不变时导出结果相同）
+        :return: 按首次请求顺序排列的字典列表
+        """
+        with self._lock:
+            return [
+                {
+                    "scene": entry.scene,
+                    "number": str(entry.number),
+                    "content": entry.record.content if entry.record else "",
+                    "users": sorted(entry.users),
+                    "count": entry.count,
+                    "first_time": entry.first_time,
+                    "last_time": entry.last_time
+                }
+                for entry in self._entries.values()
+            ]
+
+    def restore(self, items, max_size=10, max_age=0):
+        """
+        从断点恢复队列（已过期的场景直接丢弃）
+        :param items: export() 导出的列表
+        :param max_size: 最多排队的场景数
+        :param max_age: 过期时间（秒），为0时不过期
+        :return: 恢复的场景数
+        """
+        now = time.monotonic()
+        wall_now = time.time()
+        with self._lock:
+            for item in items or []:
+                scene = item.get("scene")
+                if not scene or scene in self._entries:
+                    continue
+                last_time = item.get("last_time", wall_now)
+                first_time = item.get("first_time", last_time)
+                if max_age and wall_now - last_time > max_age:
+                    self.expired += 1
+                    continue
+                number = item.get("number", "")
+                record = SpeechRecord.from_command(number, item.get("content", ""))
+                self._evict_for(max_size)
+                entry = PendingRequest(scene, number, record, now - (wall_now - first_time), first_time)
+                entry.last_seen = now - (wall_now - last_time)
+                entry.last_time = last_time
+                entry.users = set(item.get("users") or [])
+                entry.count = item.get("count", len(entry.users) or 1)
+                self._entries[scene] = entry
+            return len(self._entries)
+
+    def clear(self):
+        """清空队列"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """
+        获取队列统计
+        :return: 统计字典
+        """
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'queued': self.queued,
+                'served': self.served,
+                'expired': self.expired,
+                'evicted': self.evicted
+            }
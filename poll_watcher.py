@@ -0,0 +1,84 @@
+"""
+自适应轮询监控模块
+功能：
+1. 定期检查文件的大小、修改时间和标识，发现变化时回调
+2. 有新内容时缩短轮询间隔，空闲时逐步放慢，降低空转开销
+3. 作为文件系统事件不可靠（如网络共享目录）时的备用监控方式
+"""
+
+import os
+import threading
+import time
+
+
+class AdaptivePoller:
+    """基于 stat 的自适应轮询器"""
+
+    def __init__(self, get_path, on_change, min_interval=0.1, max_interval=2.0, backoff=1.5):
+        """
+        初始化轮询器
+        :param get_path: 返回当前要轮询的文件路径的函数（监控目标可能切换）
+        :param on_change: 文件发生变化时调用的函数
+        :param min_interval: 最短轮询间隔（秒），有新内容时使用
+        :param max_interval: 最长轮询间隔（秒），空闲时逐步放慢到此值
+        :param backoff: 每次空闲轮询后间隔的放大倍数
+        """
+        self.get_path = get_path
+        self.on_change = on_change
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        self.backoff = backoff
+        self.interval = min_interval
+        self.active = False
+        self.poll_count = 0
+        self.change_count = 0
+
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._last_signature = None
+
+    def _signature(self, path):
+        """获取文件的 (标识, 大小, 修改时间)，文件不存在时返回None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+    def start(self):
+        """启动轮询线程"""
+        if self.active:
+            return
+        self.active = True
+        self.interval = self.min_interval
+        self._last_signature = self._signature(self.get_path())
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止轮询线程"""
+        self.active = False
+        self._stop_event.set()
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=2)
+
+    def _run(self):
+        """轮询线程主循环"""
+        while not self._stop_event.wait(self.interval):
+            self.poll_count += 1
+            signature = self._signature(self.get_path())
+
+            if signature != self._last_signature:
+                self._last_signature = signature
+                self.change_count += 1
+                # 有新内容：立即恢复最短间隔
+                self.interval = self.min_interval
+                try:
+                    self.on_change()
+                except Exception as e:
+                    timestamp = time.strftime('%H:%M:%S')
+                    print(f"\n❌ [{timestamp}] 轮询处理出错: {e}")
+            else:
+                # 空闲：逐步放慢
+                self.interval = min(self.interval * self.backoff, self.max_interval)
@@ -0,0 +1,138 @@
+"""
+场景查找模块
+功能：
+1. 配置加载时把场景表编译为索引：切换命令 -> 场景名称 的字典，精确匹配只需一次查找
+2. 没有精确匹配的数字（如 14.5）按有序的候选场景表二分查找最接近的场景
+3. 候选场景和取整规则在 scene_settings.nearest_mapping 中声明，不再写死在代码里
+"""
+
+from bisect import bisect_left, bisect_right
+
+# 与原先硬编码规则相同的默认映射：向下取到最近的候选场景，超出范围时取边界场景
+DEFAULT_NEAREST_MAPPING = {
+    "enabled": True,
+    "candidates": ["6", "8", "10", "12", "14"],
+    "rounding": "floor",
+    "out_of_range": "clamp"
+}
+
+ROUNDING_MODES = ("floor", "ceil", "nearest")
+
+
+def _scene_name(scene_info):
+    """获取场景名称（兼容新旧配置格式）"""
+    return scene_info.get("场景名称", scene_info.get("name"))
+
+
+class SceneResolver:
+    """编译后的场景查找表"""
+
+    def __init__(self, scenes=None, nearest_mapping=None):
+        """
+        编译场景查找表
+        :param scenes: scene_settings.scenes 配置
+        :param nearest_mapping: scene_settings.nearest_mapping 配置，为None时使用默认规则
+        """
+        self.commands = {}      # 切换命令 -> 场景名称
+        self.legacy_numbers = {}  # 旧格式 number -> 场景名称（只用于没有“切换命令”的场景）
+        for scene_info in (scenes or {}).values():
+            if not scene_info.get("enabled", True):
+                continue
+            name = _scene_name(scene_info)
+            if "切换命令" in scene_info:
+                self.commands.setdefault(str(scene_info["切换命令"]), name)
+            elif isinstance(scene_info.get("number"), int):
+                self.legacy_numbers.setdefault(scene_info["number"], name)
+
+        mapping = dict(DEFAULT_NEAREST_MAPPING)
+        mapping.update(nearest_mapping or {})
+        self.rounding = mapping.get("rounding", "floor")
+        if self.rounding not in ROUNDING_MODES:
+            print(f"⚠️ 未知的取整规则 {self.rounding}，使用 floor")
+            self.rounding = "floor"
+        self.clamp = mapping.get("out_of_range", "clamp") == "clamp"
+
+        # 有序的 (数值, 切换命令) 表，只包含已启用且存在的候选场景
+        table = {}
+        if mapping.get("enabled", True):
+            for command in mapping.get("candidates", []):
+                command = str(command)
+                if command not in self.commands:
+                    continue
+                try:
+                    table.setdefault(float(command), command)
+                except ValueError:
+                    print(f"⚠️ 智能映射候选场景不是数字，已忽略: {command}")
+        self._values = sorted(table)
+        self._candidates = [table[value] for value in self._values]
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        根据完整配置编译场景查找表
+        :param config: 配置字典，可以为None
+        :return: SceneResolver 实例
+        """
+        scene_settings = (config or {}).get("scene_settings") or {}
+        return cls(scene_settings.get("scenes"), scene_settings.get("nearest_mapping"))
+
+    @property
+    def candidates(self):
+        """参与智能映射的切换命令（按数值排序）"""
+        return list(self._candidates)
+
+    def exact(self, number):
+        """
+        精确查找切换命令对应的场景
+        :param number: 切换命令
+        :return: 场景名称或None
+        """
+        command = str(number)
+        scene = self.commands.get(command)
+        if scene is None and self.legacy_numbers and command.isdigit():
+            scene = self.legacy_numbers.get(int(command))
+        return scene
+
+    def nearest(self, number):
+        """
+        按取整规则查找最接近的候选场景
+        :param number: 切换命令
+        :return: 候选场景的切换命令，不是数字或超出范围（且不取边界）时返回None
+        """
+        values = self._values
+        if not values:
+            return None
+        try:
+            value = float(number)
+        except (TypeError, ValueError):
+            return None
+
+        if self.rounding == "floor":
+            index = bisect_right(values, value) - 1
+        elif self.rounding == "ceil":
+            index = bisect_left(values, value)
+        else:
+            index = bisect_left(values, value)
+            # 与左右两个候选比较距离，距离相同时取较小的
+            if index == len(values) or (index > 0 and value - values[index - 1] <= values[index] - value):
+                index -= 1
+
+        if index < 0 or index >= len(values):
+            if not self.clamp:
+                return None
+            index = 0 if index < 0 else len(values) - 1
+        return self._candidates[index]
+
+    def resolve(self, number):
+        """
+        查找切换命令对应的场景（精确匹配，找不到时智能映射）
+        :param number: 切换命令
+        :return: (目标场景名称, 最终切换命令, 是否经过智能映射)，找不到时场景名称为None
+        """
+        scene = self.exact(number)
+        if scene is not None:
+            return scene, number, False
+        mapped = self.nearest(number)
+        if mapped is None:
+            return None, number, False
+        return self.commands[mapped], mapped, True
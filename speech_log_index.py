@@ -0,0 +1,184 @@
+"""
+用户发言记录文件索引模块
+功能：
+1. 使用 os.scandir 扫描日志目录，缓存每个发言记录文件的 stat 结果
+2. 根据 watchdog 的创建/删除/移动事件增量更新索引
+3. 优先按文件名中的时间戳排序，避免各平台 ctime 含义不一致
+"""
+
+import os
+import re
+import fnmatch
+import threading
+import time
+
+# 用户发言记录文件名模式
+USER_SPEECH_LOG_PATTERN = "*用户发言记录*.txt"
+
+# 文件名中的时间戳：2025-08-29、2025_08_29 22-53-09、20250829225309 等
+_NAME_TIMESTAMP_RE = re.compile(
+    r'(\d{4})[-_.年]?(\d{2})[-_.月]?(\d{2})日?'
+    r'(?:[\s_\-T]*(\d{2})[-_.:时]?(\d{2})(?:[-_.:分]?(\d{2}))?)?'
+)
+
+
+def is_user_speech_log(file_path):
+    """
+    判断文件名是否符合用户发言记录文件模式
+    :param file_path: 文件路径
+    :return: 是否为用户发言记录文件
+    """
+    return fnmatch.fnmatch(os.path.basename(file_path), USER_SPEECH_LOG_PATTERN)
+
+
+def parse_name_timestamp(file_name):
+    """
+    从文件名中解析时间戳
+    :param file_name: 文件名
+    :return: 时间戳（秒），文件名中没有合法日期时返回None
+    """
+    match = _NAME_TIMESTAMP_RE.search(file_name)
+    if not match:
+        return None
+
+    parts = [int(value) if value else 0 for value in match.groups()]
+    year, month, day, hour, minute, second = parts
+    try:
+        return time.mktime((year, month, day, hour, minute, second, 0, 0, -1))
+    except (OverflowError, ValueError):
+        return None
+
+
+class SpeechLogIndex:
+    """用户发言记录文件索引"""
+
+    def __init__(self, log_directory, order_by="name"):
+        """
+        初始化文件索引并执行首次扫描
+        :param log_directory: 日志文件目录
+        :param order_by: 排序方式，"name" 按文件名时间戳（无时间戳时退回 ctime），"ctime" 按创建时间
+        """
+        self.log_directory = os.path.abspath(log_directory)
+        self.order_by = order_by
+        self._entries = {}  # 路径 -> (排序键, stat结果)
+        self._lock = threading.Lock()
+        self.scan()
+
+    def _sort_key(self, path, stat):
+        """计算文件的排序键"""
+        if self.order_by == "name":
+            name_time = parse_name_timestamp(os.path.basename(path))
+            if name_time is not None:
+                return (name_time, stat.st_ctime)
+        return (stat.st_ctime, stat.st_ctime)
+
+    def scan(self):
+        """
+        扫描目录，只对新出现的文件调用 stat，已缓存的文件直接复用
+        :return: 索引中的文件数量
+        """
+        found = {}
+        try:
+            with os.scandir(self.log_directory) as entries:
+                for entry in entries:
+                    if not fnmatch.fnmatch(entry.name, USER_SPEECH_LOG_PATTERN):
+                        continue
+                    path = os.path.abspath(entry.path)
+                    cached = self._entries.get(path)
+                    if cached:
+                        found[path] = cached
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    found[path] = (self._sort_key(path, stat), stat)
+        except OSError:
+            found = {}
+
+        with self._lock:
+            self._entries = found
+        return len(found)
+
+    def add(self, path):
+        """
+        将新建的文件加入索引
+        :param path: 文件路径
+        :return: 是否加入成功
+        """
+        path = os.path.abspath(path)
+        if os.path.dirname(path) != self.log_directory or not is_user_speech_log(path):
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        with self._lock:
+            self._entries[path] = (self._sort_key(path, stat), stat)
+        return True
+
+    def remove(self, path):
+        """
+        从索引中移除文件
+        :param path: 文件路径
+        """
+        with self._lock:
+            self._entries.pop(os.path.abspath(path), None)
+
+    def move(self, src_path, dest_path):
+        """
+        处理文件重命名
+        :param src_path: 原路径
+        :param dest_path: 新路径
+        """
+        self.remove(src_path)
+        self.add(dest_path)
+
+    def latest(self):
+        """
+        获取最新的用户发言记录文件
+        :return: 文件路径，索引为空时返回None
+        """
+        with self._lock:
+            if not self._entries:
+                return None
+            return max(self._entries.items(), key=lambda item: item[1][0])[0]
+
+    def paths(self):
+        """
+        获取索引中的所有文件
+        :return: 文件路径列表
+        """
+        with self._lock:
+            return list(self._entries)
+
+    def get_stat(self, path):
+        """
+        获取缓存的 stat 结果
+        :param path: 文件路径
+        :return: stat结果，不在索引中时返回None
+        """
+        with self._lock:
+            entry = self._entries.get(os.path.abspath(path))
+        return entry[1] if entry else None
+
+    def is_newer(self, path, other_path):
+        """
+        判断 path 是否比 other_path 更新
+        :param path: 候选文件
+        :param other_path: 当前文件（不在索引中时视为最旧）
+        :return: 是否更新
+        """
+        with self._lock:
+            entry = self._entries.get(os.path.abspath(path))
+            other = self._entries.get(os.path.abspath(other_path))
+        if not entry:
+            return False
+        if not other:
+            return True
+        return entry[0] > other[0]
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,314 @@
+"""
+用户发言解析模块
+功能：
+1. 正则表达式在导入时编译一次，不在每行处理时重复 import / 编译
+2. 三种日志格式合并为一个正则，一次匹配提取发言内容
+3. 数字只提取一次，由编译后的命令规则查表换算
+4. 批量解析接口：输入文本行或字节块的迭代器，以生成器输出结构化结果，
+   不打印、不依赖 OBSManager 和 watchdog，可用于离线回放和补处理整天的日志
+5. SpeechRecord 在解析、场景切换和统计之间传递，各环节不再重复解析同一行
+"""
+
+import codecs
+import re
+import sys
+import time
+from command_rules import CommandRules
+
+# 三种格式按优先级合并为一个正则（交替分支按顺序尝试，与依次匹配三个正则的结果一致）：
+# - 2025-08-29 22:53:09[用户发言]t： 有黄水吗
+# - [用户发言]用户名： 内容
+# - 22:53:09 用户名： 内容
+# 分组1：第一种格式的日志时间戳，分组2：用户名，分组3：发言内容
+SPEECH_PATTERN = re.compile(
+    r'(?:(\d{4}-\d{2}-\d{2}\s+\d{2}:\d{2}:\d{2})\[用户发言\]'
+    r'|\[用户发言\]'
+    r'|\d{2}:\d{2}:\d{2}\s+)'
+    r'([^：]*)：\s*(.*)'
+)
+
+# 日志行开头的时间戳：2025-08-29 22:53:09
+LOG_TIME_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2})\s+(\d{2}:\d{2}:\d{2})')
+
+EMPTY_CONTENT = "空内容"
+
+# 未指定规则时使用的默认命令规则
+DEFAULT_RULES = CommandRules()
+
+
+class SpeechRecord:
+    """一行用户发言的解析结果（__slots__，不为每条记录创建 __dict__）"""
+
+    __slots__ = ("line", "time_text", "username", "content", "command", "_log_time")
+
+    def __init__(self, line, time_text, username, content, command=None):
+        """
+        :param line: 原始日志行（引用，不复制）
+        :param time_text: 日志时间戳原文（如 "2025-08-29 22:53:09"），没有时为None
+        :param username: 用户名，没有时为None
+        :param content: 发言内容
+        :param command: 切换命令，不是命令时为None
+        """
+        self.line = line
+        self.time_text = time_text
+        self.username = username
+        self.content = content
+        self.command = command
+        self._log_time = False  # False 表示尚未解析
+
+    @classmethod
+    def from_command(cls, command, content=""):
+        """
+        根据切换命令创建记录（手动切换、从断点恢复等没有原始日志行的场合）
+        :param command: 切换命令
+        :param content: 发言内容
+        :return: SpeechRecord 实例
+        """
+        return cls(content, None, None, content, str(command))
+
+    @property
+    def log_time(self):
+        """日志时间戳（秒），第一次访问时才解析，没有时间戳时为None"""
+        if self._log_time is False:
+            self._log_time = _parse_time_text(self.time_text) if self.time_text else None
+        return self._log_time
+
+    def __repr__(self):
+        return (f"SpeechRecord(time_text={self.time_text!r}, username={self.username!r}, "
+                f"content={self.content!r}, command={self.command!r})")
+
+
+def extract_user_speech(line):
+    """
+    提取用户发言内容，去除时间戳和用户标识等前缀
+    :param line: 日志行
+    :return: 发言内容；没有匹配任何格式时返回去除首尾空白的原始行
+    """
+    if not line:
+        return EMPTY_CONTENT
+    original_line = line.strip()
+    if not original_line:
+        return EMPTY_CONTENT
+
+    match = SPEECH_PATTERN.match(original_line)
+    if not match:
+        return original_line
+    return match.group(3).strip() or EMPTY_CONTENT
+
+
+def extract_number_with_kan(content, rules=None):
+    """
+    检测发言内容中的切换命令（触发词 + 数字，按命令规则换算）
+    :param content: 用户发言的纯净内容
+    :param rules: CommandRules 实例，为None时使用默认规则
+    :return: 场景编号字符串或None
+    """
+    return (rules or DEFAULT_RULES).resolve(content)
+
+
+def split_speech(line):
+    """
+    把一行拆分为时间戳、用户名和发言内容（不检测切换命令）
+    :param line: 日志行
+    :return: SpeechRecord 实例，command 为None
+    """
+    original_line = line.strip() if line else ""
+    if not original_line:
+        return SpeechRecord(line, None, None, EMPTY_CONTENT)
+
+    match = SPEECH_PATTERN.match(original_line)
+    if not match:
+        return SpeechRecord(line, None, None, original_line)
+    time_text, username, content = match.groups()
+    return SpeechRecord(line, time_text, username.strip(), content.strip() or EMPTY_CONTENT)
+
+
+def parse_record(line, rules=None):
+    """
+    把一行解析为 SpeechRecord 并检测切换命令
+    :param line: 日志行
+    :param rules: CommandRules 实例，为None时使用默认规则
+    :return: SpeechRecord 实例
+    """
+    record = split_speech(line)
+    record.command = (rules or DEFAULT_RULES).resolve(record.content)
+    return record
+
+
+def parse_speech(line, rules=None):
+    """
+    一次调用完成发言提取和数字检测
+    :param line: 日志行
+    :param rules: CommandRules 实例，为None时使用默认规则
+    :return: (发言内容, 场景编号字符串或None)
+    """
+    content = extract_user_speech(line)
+    return content, extract_number_with_kan(content, rules)
+
+
+def parse_log_time(line):
+    """
+    解析日志行开头的时间戳
+    :param line: 日志行
+    :return: 时间戳（秒），没有时间戳时返回None
+    """
+    match = LOG_TIME_PATTERN.match(line)
+    if not match:
+        return None
+    return _parse_time_text(f"{match.group(1)} {match.group(2)}")
+
+
+def _parse_time_text(time_text):
+    """
+    把时间戳原文转换为秒
+    :param time_text: 如 "2025-08-29 22:53:09"（日期和时间之间可以有多个空白）
+    :return: 时间戳（秒），格式错误时返回None
+    """
+    try:
+        return time.mktime(time.strptime(" ".join(time_text.split()), '%Y-%m-%d %H:%M:%S'))
+    except ValueError:
+        return None
+
+
+def iter_lines(chunks, encoding='utf-8'):
+    """
+    把文本行或字节块的迭代器转换为文本行
+    字节块按增量解码器解码，跨块的行和多字节字符会被正确拼接
+    :param chunks: str（一行或多行文本）或 bytes（任意切分的字节块）的迭代器
+    :param encoding: 字节块的编码
+    :return: 文本行生成器（不含换行符）
+    """
+    decoder = None
+    pending = ''
+    for chunk in chunks:
+        if isinstance(chunk, (bytes, bytearray)):
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+            chunk = decoder.decode(chunk)
+        elif not pending and '\n' not in chunk.rstrip('\r\n'):
+            # 常见情况：每个元素就是一行
+            yield chunk.rstrip('\r\n')
+            continue
+        lines = (pending + chunk).split('\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line.rstrip('\r')
+    if decoder is not None:
+        pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending.rstrip('\r')
+
+
+def parse_batch(lines, rules=None, commands_only=False):
+    """
+    批量解析（列表快速路径）：正则和规则方法提前绑定为局部变量，每行不再经过多层函数调用
+    :param lines: 文本行列表
+    :param rules: CommandRules 实例，为None时使用默认规则
+    :param commands_only: 是否只返回切换命令行
+    :return: SpeechRecord 列表，空行被跳过
+    """
+    match_speech = SPEECH_PATTERN.match
+    match_time = LOG_TIME_PATTERN.match
+    resolve = (rules or DEFAULT_RULES).resolve
+    results = []
+    append = results.append
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        match = match_speech(line)
+        if match:
+            time_text, username, content = match.groups()
+            content = content.strip() or EMPTY_CONTENT
+            username = username.strip()
+        else:
+            time_text = username = None
+            content = line
+        command = resolve(content)
+        if commands_only and command is None:
+            continue
+        if time_text is None and line[0].isdigit():
+            # 其他格式的行（如系统消息）也可能带时间戳
+            time_match = match_time(line)
+            if time_match:
+                time_text = time_match.group(0)
+        append(SpeechRecord(line, time_text, username, content, command))
+    return results
+
+
+def parse_lines(lines, rules=None, commands_only=False, batch_size=1024, encoding='utf-8'):
+    """
+    解析文本行或字节块的迭代器
+    列表直接走 parse_batch；其他迭代器按 batch_size 分批解析，内存占用与日志大小无关
+    :param lines: 文本行列表，或 str / bytes 块的迭代器
+    :param rules: CommandRules 实例，为None时使用默认规则
+    :param commands_only: 是否只输出切换命令行
+    :param batch_size: 每批解析的行数
+    :param encoding: 字节块的编码
+    :return: SpeechRecord 生成器
+    """
+    if isinstance(lines, list) and all(isinstance(line, str) for line in lines):
+        yield from parse_batch(lines, rules, commands_only)
+        return
+
+    batch = []
+    for line in iter_lines(lines, encoding=encoding):
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield from parse_batch(batch, rules, commands_only)
+            batch = []
+    if batch:
+        yield from parse_batch(batch, rules, commands_only)
+
+
+def parse_file(file_path, encoding=None, rules=None, commands_only=False, chunk_size=64 * 1024):
+    """
+    解析整个日志文件（按块读取，编码自动检测）
+    :param file_path: 日志文件路径
+    :param encoding: 文件编码，为None时自动检测（BOM + 采样）
+    :param rules: CommandRules 实例，为None时使用默认规则
+    :param commands_only: 是否只输出切换命令行
+    :param chunk_size: 每次读取的字节数
+    :return: SpeechRecord 生成器
+    """
+    from log_tailer import detect_file_encoding
+
+    bom_length = 0
+    if encoding is None:
+        detected = detect_file_encoding(file_path)
+        if detected is None:
+            return
+        encoding, bom_length = detected
+
+    def read_chunks():
+        with open(file_path, 'rb') as f:
+            f.seek(bom_length)
+            while True:
+                chunk = f.read(chunk_size)
+                if not chunk:
+                    return
+                yield chunk
+
+    yield from parse_lines(read_chunks(), rules, commands_only, encoding=encoding)
+
+
+def main():
+    """离线解析入口：列出日志文件中的切换命令"""
+    if len(sys.argv) < 2:
+        print("用法: python speech_parser.py 用户发言记录.txt [obs_config.json]")
+        return
+
+    from command_rules import load_command_rules
+    rules = load_command_rules(sys.argv[2]) if len(sys.argv) > 2 else load_command_rules()
+
+    total = 0
+    start = time.perf_counter()
+    for record in parse_file(sys.argv[1], rules=rules, commands_only=True):
+        total += 1
+        print(f"{record.time_text or '-'}  {record.command:>6}  {record.username or '-'}: {record.content}")
+    elapsed = time.perf_counter() - start
+    print(f"\n📊 共 {total:,} 条切换命令，耗时 {elapsed:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
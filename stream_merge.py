@@ -0,0 +1,93 @@
+"""
+多日志流合并模块
+功能：
+1. 把多个同时写入的发言记录文件的行合并为一个按日志时间排序的流
+2. 使用堆做 k 路归并，并保留一个小的乱序窗口，等待稍晚到达的其他文件的行
+3. 等待超过窗口时间的行即使没有更新的时间戳也会放行，不会被无限期扣留
+"""
+
+import heapq
+import itertools
+import time
+
+
+class TimestampMerger:
+    """按时间戳归并多个日志流"""
+
+    def __init__(self, reorder_window=1.0):
+        """
+        初始化归并器
+        :param reorder_window: 乱序窗口（秒）：一行最多等待这么久，或直到出现比它晚这么多的行
+        """
+        self.reorder_window = reorder_window
+        self._heap = []                    # (日志时间, 序号, 到达时间, 元素)
+        self._sequence = itertools.count()  # 同一秒内按到达顺序排列
+        self._last_time = {}               # 流标识 -> 最近一行的日志时间
+        self.max_seen_time = None
+        self.merged_count = 0
+        self.reordered_count = 0           # 输出时晚于已输出行的日志时间被纠正的次数
+        self._last_released_time = None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, source, log_time, item):
+        """
+        加入一行
+        :param source: 流标识（如文件路径）
+        :param log_time: 日志时间戳（秒），为None时沿用该流上一行的时间
+        :param item: 要输出的元素
+        """
+        now = time.monotonic()
+        if log_time is None:
+            log_time = self._last_time.get(source)
+            if log_time is None:
+                log_time = self.max_seen_time if self.max_seen_time is not None else time.time()
+        self._last_time[source] = log_time
+        if self.max_seen_time is None or log_time > self.max_seen_time:
+            self.max_seen_time = log_time
+        heapq.heappush(self._heap, (log_time, next(self._sequence), now, item))
+
+    def pop_ready(self):
+        """
+        取出已经可以按顺序输出的行
+        :return: 元素列表（按日志时间排序）
+        """
+        ready = []
+        now = time.monotonic()
+        watermark = self.max_seen_time - self.reorder_window if self.max_seen_time is not None else None
+        while self._heap:
+            log_time, _, arrived, item = self._heap[0]
+            if log_time > watermark and now - arrived < self.reorder_window:
+                break
+            heapq.heappop(self._heap)
+            self._record_release(log_time)
+            ready.append(item)
+        return ready
+
+    def flush(self):
+        """
+        取出所有剩余的行
+        :return: 元素列表（按日志时间排序）
+        """
+        ready = []
+        while self._heap:
+            log_time, _, _, item = heapq.heappop(self._heap)
+            self._record_release(log_time)
+            ready.append(item)
+        return ready
+
+    def forget(self, source):
+        """
+        移除不再活跃的流的状态
+        :param source: 流标识
+        """
+        self._last_time.pop(source, None)
+
+    def _record_release(self, log_time):
+        """记录一次输出"""
+        self.merged_count += 1
+        if self._last_released_time is not None and log_time < self._last_released_time:
+            self.reordered_count += 1
+        else:
+            self._last_released_time = log_time
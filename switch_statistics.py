@@ -8,10 +8,10 @@
 
 import sqlite3
 import threading
-import time
 from datetime import datetime, timedelta
-import schedule
 import os
+from speech_parser import SpeechRecord
+from timer_scheduler import get_scheduler
 
 class SwitchStatistics:
     """场景切换统计管理器"""
@@ -24,6 +24,8 @@ class SwitchStatistics:
         self.db_path = db_path
         self.session_switch_count = 0  # 本次启动后的切换次数
         self.lock = threading.Lock()
+        self.hourly_timer = None
+        self._next_hour = None  # 下一次整点统计的系统时间
         
         # 初始化数据库
         self._init_database()
@@ -69,13 +71,20 @@ class SwitchStatistics:
         except sqlite3.Error as e:
             print(f"❌ 数据库初始化失败: {e}")
     
-    def record_switch(self, user_content, scene_number, scene_name=None):
+    def record_switch(self, record, scene_number=None, scene_name=None):
         """
         记录一次成功的场景切换
-        :param user_content: 用户发言内容
-        :param scene_number: 场景编号
+        :param record: 触发切换的发言记录（SpeechRecord），也可以直接传入发言内容字符串
+        :param scene_number: 场景编号，为None时使用 record.command
         :param scene_name: 场景名称
         """
+        if isinstance(record, SpeechRecord):
+            user_content = record.content
+            if scene_number is None:
+                scene_number = record.command
+        else:
+            user_content = record
+        
         with self.lock:
             try:
                 # 更新本次启动的计数
@@ -200,24 +209,25 @@ class SwitchStatistics:
             print(f"❌ 打印整点统计失败: {e}")
     
     def _start_scheduler(self):
-        """启动定时任务调度器"""
-        def job():
-            self._print_hourly_statistics()
-        
-        # 设置每个整点触发
-        schedule.every().hour.at(":00").do(job)
-        
-        def run_scheduler():
-            while True:
-                schedule.run_pending()
-                time.sleep(1)
-        
-        # 启动调度器线程
-        scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-        scheduler_thread.start()
-        
+        """启动整点统计定时任务（由共享的调度线程执行，不再每秒轮询）"""
+        self.scheduler = get_scheduler()
+        self._schedule_next_hour()
         print("⏰ 整点统计定时器已启动")
     
+    def _schedule_next_hour(self):
+        """按系统时间计算到下一个整点的秒数，安排下一次整点统计"""
+        now = datetime.now()
+        if self._next_hour is None or self._next_hour <= now:
+            self._next_hour = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        self.hourly_timer = self.scheduler.call_later((self._next_hour - now).total_seconds(), self._hourly_job)
+    
+    def _hourly_job(self):
+        """整点统计任务：打印统计并安排下一次"""
+        # 单调时钟与系统时间有偏差时可能提前一点触发，此时只重新安排到整点
+        if datetime.now() >= self._next_hour:
+            self._print_hourly_statistics()
+        self._schedule_next_hour()
+    
     def get_recent_records(self, limit=10):
         """获取最近的切换记录"""
         try:
@@ -0,0 +1,155 @@
+"""
+定时任务调度模块
+功能：
+1. 一个调度线程 + 按截止时间排序的堆，代替每次切换都新建的 threading.Timer 和每秒轮询的 schedule
+2. 截止时间使用单调时钟（time.monotonic），系统时间被 NTP 校正时冷却和延迟不会跳变
+3. 没有任务时线程一直等待，不会空转唤醒；每个任务返回可取消的句柄
+"""
+
+import heapq
+import itertools
+import threading
+import time
+
+
+class TimerHandle:
+    """定时任务句柄"""
+
+    __slots__ = ("deadline", "sequence", "callback", "args", "name", "cancelled")
+
+    def __init__(self, deadline, sequence, callback, args, name):
+        self.deadline = deadline
+        self.sequence = sequence
+        self.callback = callback
+        self.args = args
+        self.name = name
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.deadline, self.sequence) < (other.deadline, other.sequence)
+
+    def cancel(self):
+        """取消任务（已经执行的任务取消无效）"""
+        self.cancelled = True
+
+    def remaining(self):
+        """
+        距离执行还剩多少秒
+        :return: 秒数，已到期时为0
+        """
+        return max(0.0, self.deadline - time.monotonic())
+
+
+class TimerScheduler:
+    """单线程定时任务调度器"""
+
+    def __init__(self, name="timer-scheduler"):
+        """
+        初始化调度器（调度线程在第一次添加任务时启动）
+        :param name: 调度线程名称
+        """
+        self.name = name
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.executed_count = 0
+
+    def call_later(self, delay, callback, *args, name=None):
+        """
+        在 delay 秒后执行 callback(*args)
+        :param delay: 延迟（秒）
+        :param callback: 回调函数（在调度线程中执行）
+        :param name: 任务名称（出错时用于提示）
+        :return: TimerHandle
+        """
+        return self.call_at(time.monotonic() + max(0.0, delay), callback, *args, name=name)
+
+    def call_at(self, deadline, callback, *args, name=None):
+        """
+        在单调时钟到达 deadline 时执行 callback(*args)
+        :param deadline: time.monotonic() 时间点
+        :param callback: 回调函数（在调度线程中执行）
+        :param name: 任务名称（出错时用于提示）
+        :return: TimerHandle
+        """
+        handle = TimerHandle(deadline, next(self._sequence), callback, args, name or getattr(callback, "__name__", "task"))
+        with self._condition:
+            heapq.heappush(self._heap, handle)
+            self._ensure_thread()
+            # 新任务成为最早到期的任务时才需要唤醒调度线程
+            if self._heap[0] is handle:
+                self._condition.notify()
+        return handle
+
+    def _ensure_thread(self):
+        """启动调度线程（调用时已持有锁）"""
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def pending_count(self):
+        """
+        获取等待中的任务数
+        :return: 未取消的任务数
+        """
+        with self._condition:
+            return sum(1 for handle in self._heap if not handle.cancelled)
+
+    def stop(self):
+        """停止调度线程，丢弃所有未执行的任务"""
+        with self._condition:
+            self._running = False
+            self._heap.clear()
+            self._condition.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+
+    def _run(self):
+        """调度线程主循环"""
+        while True:
+            with self._condition:
+                handle = None
+                while self._running:
+                    heap = self._heap
+                    while heap and heap[0].cancelled:
+                        heapq.heappop(heap)
+                    if not heap:
+                        # 没有任务：等待新任务，不定时唤醒
+                        self._condition.wait()
+                        continue
+                    wait = heap[0].deadline - time.monotonic()
+                    if wait > 0:
+                        self._condition.wait(wait)
+                        continue
+                    handle = heapq.heappop(heap)
+                    break
+                if handle is None:
+                    return
+
+            try:
+                handle.callback(*handle.args)
+            except Exception as e:
+                timestamp = time.strftime('%H:%M:%S')
+                print(f"\n❌ [{timestamp}] 定时任务 {handle.name} 出错: {e}")
+            self.executed_count += 1
+
+
+_default_scheduler = None
+_default_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+    获取进程共享的调度器（所有 OBS 管理器和统计模块共用一个调度线程）
+    :return: TimerScheduler 实例
+    """
+    global _default_scheduler
+    with _default_lock:
+        if _default_scheduler is None:
+            _default_scheduler = TimerScheduler()
+        return _default_scheduler
@@ -0,0 +1,79 @@
+"""
+场景投票模块
+功能：
+1. 在一个时间窗口内收集观众的切换请求，每个用户只算一票（改投时票数转移）
+2. 窗口结束时切换到票数最多的场景，票数相同时取最先获得投票的场景
+3. 只用两个字典计数，每条请求 O(1)，每秒几千条也不会成为瓶颈
+"""
+
+import threading
+
+
+class VoteBallot:
+    """一个投票窗口内的计票"""
+
+    def __init__(self):
+        """初始化空的计票"""
+        self._lock = threading.Lock()
+        self._user_votes = {}   # 用户 -> 投给的场景
+        self._counts = {}       # 场景 -> [票数, 首次获得投票的序号, 代表性的 (最终切换命令, 发言记录)]
+        self._sequence = 0
+        self.total_requests = 0
+
+    def add(self, user, scene, number, record):
+        """
+        记录一票
+        :param user: 用户标识，为None时每条请求都算一票
+        :param scene: 目标场景名称
+        :param number: 最终切换命令
+        :param record: 发言记录（SpeechRecord）
+        :return: 该场景当前的票数
+        """
+        with self._lock:
+            self.total_requests += 1
+            if user is None:
+                user = ("anonymous", self.total_requests)
+
+            previous = self._user_votes.get(user)
+            if previous == scene:
+                return self._counts[scene][0]
+            if previous is not None:
+                # 用户改投：从原场景移走一票
+                self._counts[previous][0] -= 1
+            self._user_votes[user] = scene
+
+            entry = self._counts.get(scene)
+            if entry is None:
+                self._sequence += 1
+                entry = self._counts[scene] = [0, self._sequence, (number, record)]
+            entry[0] += 1
+            return entry[0]
+
+    def winner(self):
+        """
+        获取票数最多的场景
+        :return: (场景名称, 最终切换命令, 发言记录, 票数)，没有投票时返回None
+        """
+        with self._lock:
+            best = None
+            for scene, (count, sequence, sample) in self._counts.items():
+                if count <= 0:
+                    continue
+                if best is None or (count, -sequence) > (best[3], -best[4]):
+                    best = (scene, sample[0], sample[1], count, sequence)
+            return best[:4] if best else None
+
+    def ranking(self, limit=3):
+        """
+        获取票数排名
+        :param limit: 返回的场景数
+        :return: (场景名称, 票数) 列表
+        """
+        with self._lock:
+            items = sorted(self._counts.items(), key=lambda item: (-item[1][0], item[1][1]))
+            return [(scene, entry[0]) for scene, entry in items[:limit] if entry[0] > 0]
+
+    @property
+    def voter_count(self):
+        """参与投票的用户数"""
+        return len(self._user_votes)
@@ -0,0 +1,192 @@
+"""
+有界工作队列模块
+功能：
+1. 在文件监控线程与命令处理线程之间传递待处理的日志行
+2. 队列满时按配置的策略处理：阻塞、丢弃最旧、优先丢弃非命令行
+3. 统计队列深度和丢弃数量，便于发现弹幕高峰时处理跟不上
+4. 入队时判断一次是否为命令，命令行和非命令行分别排队，队列满时丢弃的代价为 O(1)
+"""
+
+import itertools
+import threading
+import time
+from collections import deque
+
+
+class BoundedWorkQueue:
+    """有界工作队列 + 专用处理线程"""
+
+    POLICIES = ("block", "drop_oldest", "drop_non_command")
+
+    def __init__(self, handler, max_size=1000, policy="drop_non_command", is_command=None):
+        """
+        初始化工作队列
+        :param handler: 处理单个元素的函数，在处理线程中调用
+        :param max_size: 队列最大长度
+        :param policy: 队列满时的策略（block / drop_oldest / drop_non_command）
+        :param is_command: 判断元素是否为命令的函数；drop_non_command 策略下每个元素入队时调用一次，其他策略只在丢弃时调用
+        """
+        if policy not in self.POLICIES:
+            print(f"⚠️ 未知的队列溢出策略 {policy}，使用 drop_non_command")
+            policy = "drop_non_command"
+
+        self.handler = handler
+        self.max_size = max(1, int(max_size))
+        self.policy = policy
+        self.is_command = is_command or (lambda item: True)
+
+        # 元素按 (序号, 元素, 是否为命令) 保存；drop_non_command 策略下命令行单独排队，
+        # 其他策略下 is_command 只在丢弃时调用，所有元素都在 _others 中
+        self._commands = deque()
+        self._others = deque()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._running = False
+        self._worker = None
+        self._busy = False  # 处理线程是否正在处理一个元素
+
+        # 统计信息
+        self.enqueued_count = 0
+        self.processed_count = 0
+        self.dropped_count = 0
+        self.dropped_command_count = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        """当前队列深度"""
+        return len(self._commands) + len(self._others)
+
+    def start(self):
+        """启动处理线程"""
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def stop(self, timeout=5):
+        """
+        停止处理线程，先处理完队列中剩余的元素
+        :param timeout: 等待处理线程结束的最长时间（秒）
+        """
+        with self._lock:
+            self._running = False
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        if self._worker and self._worker.is_alive():
+            self._worker.join(timeout)
+
+    def put(self, item):
+        """
+        放入一个元素
+        :param item: 待处理元素
+        :return: 是否成功入队（被丢弃时返回False）
+        """
+        # 在锁外判断一次是否为命令，之后不再重复判断
+        is_command = self.is_command(item) if self.policy == "drop_non_command" else None
+        with self._lock:
+            if self.depth >= self.max_size:
+                if self.policy == "block":
+                    while self._running and self.depth >= self.max_size:
+                        self._not_full.wait(0.5)
+                    if self.depth >= self.max_size:
+                        self._record_drop(item, is_command)
+                        return False
+                elif self.policy == "drop_oldest":
+                    self._record_drop(*self._pop_oldest()[1:])
+                elif not self._drop_non_command(item, is_command):
+                    return False
+
+            entry = (next(self._sequence), item, is_command)
+            (self._commands if is_command else self._others).append(entry)
+            self.enqueued_count += 1
+            depth = self.depth
+            if depth > self.max_depth:
+                self.max_depth = depth
+            self._not_empty.notify()
+            return True
+
+    def _pop_oldest(self):
+        """
+        取出最早入队的元素（调用时已持有锁，队列不为空）
+        :return: (序号, 元素, 是否为命令)
+        """
+        commands, others = self._commands, self._others
+        if commands and (not others or commands[0][0] < others[0][0]):
+            return commands.popleft()
+        return others.popleft()
+
+    def _drop_non_command(self, item, is_command):
+        """
+        drop_non_command 策略：优先丢弃最旧的非命令行，队列里全是命令时丢弃最旧的命令
+        调用时已持有锁
+        :param item: 新元素
+        :param is_command: 新元素是否为命令
+        :return: 新元素是否可以入队
+        """
+        if not is_command:
+            self._record_drop(item, is_command)
+            return False
+
+        queue = self._others if self._others else self._commands
+        self._record_drop(*queue.popleft()[1:])
+        return True
+
+    def _record_drop(self, item, is_command=None):
+        """
+        记录一次丢弃（调用时已持有锁）
+        :param item: 被丢弃的元素
+        :param is_command: 入队时的判断结果，为None时现在判断
+        """
+        self.dropped_count += 1
+        if is_command is None:
+            is_command = self.is_command(item)
+        if is_command:
+            self.dropped_command_count += 1
+
+    def _run(self):
+        """处理线程主循环"""
+        while True:
+            with self._lock:
+                while self._running and not self.depth:
+                    self._not_empty.wait()
+                if not self.depth:
+                    return
+                item = self._pop_oldest()[1]
+                self._busy = True
+                self._not_full.notify()
+
+            try:
+                self.handler(item)
+            except Exception as e:
+                timestamp = time.strftime('%H:%M:%S')
+                print(f"\n❌ [{timestamp}] 处理队列元素时出错: {e}")
+            with self._lock:
+                self._busy = False
+            self.processed_count += 1
+
+    @property
+    def idle(self):
+        """队列为空且没有正在处理的元素"""
+        with self._lock:
+            return not self.depth and not self._busy
+
+    def get_stats(self):
+        """
+        获取队列统计信息
+        :return: 统计字典
+        """
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'max_size': self.max_size,
+            'policy': self.policy,
+            'enqueued': self.enqueued_count,
+            'processed': self.processed_count,
+            'dropped': self.dropped_count,
+            'dropped_commands': self.dropped_command_count,
+        }